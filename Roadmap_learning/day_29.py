@@ -1,61 +1,1165 @@
 """ Day 29: Basic Project: To-Do List Manager """
 
+import bisect
+import calendar
+import copy
+import csv
+import gzip
+import heapq
+import asyncio
 import json
+import math
 import os
-from datetime import datetime
-from typing import List, Dict
+import random
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from enum import IntEnum
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
+
+TASK_FIELDS = ["id", "description", "completed", "priority",
+               "created_at", "completed_at", "due_at", "recurrence"]
+
+def open_text(path: str, mode: str):
+    """Open a text file for csv/json lines, gzip-compressed if it ends in .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+def add_months(moment: datetime, months: int) -> datetime:
+    """Shift a datetime by whole months, clamping to the end of shorter months"""
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+# Each maps (start, n) to the n-th occurrence after start
+RECURRENCES: Dict[str, Callable[[datetime, int], datetime]] = {
+    "daily": lambda start, n: start + timedelta(days=n),
+    "weekly": lambda start, n: start + timedelta(weeks=n),
+    "monthly": add_months
+}
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+def to_timestamp(moment: datetime) -> int:
+    """Microseconds since the epoch for a naive (local) datetime"""
+    if moment.tzinfo is not None:
+        # "2026-01-01T00:00:00+02:00": convert to local wall-clock time
+        moment = moment.astimezone().replace(tzinfo=None)
+    return (moment - EPOCH) // ONE_MICROSECOND
+
+def from_timestamp(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+def parse_timestamp(text: Optional[str]) -> Optional[int]:
+    """ISO 8601 text to a timestamp; isoformat() gives the exact text back"""
+    return None if text is None else to_timestamp(datetime.fromisoformat(text))
+
+def format_timestamp(value: Optional[int]) -> Optional[str]:
+    return None if value is None else from_timestamp(value).isoformat()
+
+def next_occurrence(due_at: int, recurrence: str, now: datetime) -> int:
+    """The first occurrence of a recurring due date that is after `now`"""
+    start = from_timestamp(due_at)
+    step = RECURRENCES[recurrence]
+    n = 1
+    while step(start, n) <= now:
+        n += 1
+    return to_timestamp(step(start, n))
+
+class Priority(IntEnum):
+    """Task priority; the value is its sort rank, so HIGH comes first"""
+    HIGH = 0
+    MEDIUM = 1
+    LOW = 2
+    
+    @classmethod
+    def parse(cls, name: str) -> "Priority":
+        try:
+            return cls[name.strip().upper()]
+        except KeyError:
+            raise ValueError(f"Unknown priority: {name}") from None
+    
+    @classmethod
+    def from_stored(cls, name: Optional[str]) -> "Priority":
+        """Parse a saved priority; versions before the enum stored any word
+        given, and those load as MEDIUM rather than failing the whole file"""
+        try:
+            return cls.parse(name or "medium")
+        except ValueError:
+            return cls.MEDIUM
+    
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+class Task:
+    """A single to-do item, stored compactly
+    
+    Priority is a Priority, timestamps are integer microseconds since the
+    epoch and descriptions are interned. to_dict/from_dict convert to and
+    from the JSON records the manager has always saved.
+    """
+    
+    __slots__ = ("id", "description", "completed", "priority",
+                 "created_at", "completed_at", "due_at", "recurrence")
+    
+    def __init__(self, task_id: int, description: str, priority: Priority = Priority.MEDIUM,
+                 created_at: Optional[int] = None, completed: bool = False,
+                 completed_at: Optional[int] = None, due_at: Optional[int] = None,
+                 recurrence: Optional[str] = None):
+        self.id = task_id
+        self.description = sys.intern(description)
+        self.completed = completed
+        self.priority = priority
+        self.created_at = to_timestamp(datetime.now()) if created_at is None else created_at
+        self.completed_at = completed_at
+        self.due_at = due_at
+        self.recurrence = sys.intern(recurrence) if recurrence else None
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Task":
+        # Files written before due dates existed lack the last two keys
+        return cls(
+            data["id"],
+            data["description"],
+            Priority.from_stored(data.get("priority")),
+            parse_timestamp(data.get("created_at")),
+            bool(data.get("completed")),
+            parse_timestamp(data.get("completed_at")),
+            parse_timestamp(data.get("due_at")),
+            data.get("recurrence")
+        )
+    
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "description": self.description,
+            "completed": self.completed,
+            "priority": self.priority.label,
+            "created_at": format_timestamp(self.created_at),
+            "completed_at": format_timestamp(self.completed_at),
+            "due_at": format_timestamp(self.due_at),
+            "recurrence": self.recurrence
+        }
+    
+    def __repr__(self) -> str:
+        return f"Task({self.to_dict()!r})"
+
+class IdAllocator:
+    """Hands out task IDs in increasing order and never reuses one, so
+    anything keyed by task ID stays valid after deletes"""
+    
+    def __init__(self, next_id: int = 1):
+        self.next_id = next_id
+    
+    def observe(self, task_id: int):
+        """Make sure an ID already in use is never handed out again"""
+        if task_id >= self.next_id:
+            self.next_id = task_id + 1
+    
+    def reserve(self, count: int = 1) -> range:
+        """Claim `count` consecutive IDs at once"""
+        ids = range(self.next_id, self.next_id + count)
+        self.next_id += count
+        return ids
+
+def write_atomically(path: str, text: str):
+    """Replace a file's contents so readers see either all or none of it"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class TaskJournal:
+    """Append-only log of task changes, replayed on top of a snapshot"""
+    
+    def __init__(self, path: str, sync_every: int = 64):
+        self.path = path
+        self.sync_every = sync_every
+        self.record_count = 0
+        self._unsynced = 0
+        self._file = None
+    
+    def replay(self) -> Iterator[Dict]:
+        """Yield the records currently in the log, oldest first"""
+        self.record_count = 0
+        if not os.path.exists(self.path):
+            return
+        good_end = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    # A line without its newline was cut off mid-write too
+                    record = json.loads(line) if line.endswith(b"\n") else None
+                except json.JSONDecodeError:
+                    record = None
+                if record is None:
+                    break
+                good_end += len(line)
+                self.record_count += 1
+                yield record
+            torn = f.seek(0, os.SEEK_END) > good_end
+        if torn:
+            # A torn final line from a crash mid-write; nothing after it was
+            # acknowledged. Cut it off so later appends start on a clean line.
+            os.truncate(self.path, good_end)
+    
+    def append(self, record: Dict):
+        """Append one record, syncing to disk every `sync_every` records"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self.record_count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+    
+    def sync(self):
+        """Flush buffered records and fsync the log"""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+    
+    def truncate(self):
+        """Drop every record (after they have been folded into a snapshot)"""
+        self.close()
+        open(self.path, 'w').close()
+        self.record_count = 0
+    
+    def close(self):
+        """Sync and close the log file"""
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class TaskStats:
+    """Running task counters, updated in O(1) as tasks change"""
+    
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.by_priority: Dict[str, int] = {}
+        self.completed_by_day: Dict[str, int] = {}
+    
+    @property
+    def pending(self) -> int:
+        return self.total - self.completed
+    
+    @staticmethod
+    def keys_for(task: Task) -> List[Tuple[str, str]]:
+        """The (kind, key) counters a task contributes one to"""
+        keys = [("total", ""), ("priority", task.priority.label)]
+        if task.completed:
+            keys.append(("completed", ""))
+            if task.completed_at is not None:
+                keys.append(("completed_on", from_timestamp(task.completed_at).date().isoformat()))
+        return keys
+    
+    @classmethod
+    def deltas(cls, old: Optional[Task], new: Optional[Task]) -> Dict[Tuple[str, str], int]:
+        """Counter changes for a task going from `old` to `new` (None = absent)"""
+        changes: Dict[Tuple[str, str], int] = {}
+        if old is not None:
+            for key in cls.keys_for(old):
+                changes[key] = changes.get(key, 0) - 1
+        if new is not None:
+            for key in cls.keys_for(new):
+                changes[key] = changes.get(key, 0) + 1
+        return {key: delta for key, delta in changes.items() if delta}
+    
+    def apply(self, changes: Dict[Tuple[str, str], int]):
+        """Add counter changes from `deltas` (or persisted counter values)"""
+        for (kind, key), delta in changes.items():
+            if kind == "total":
+                self.total += delta
+            elif kind == "completed":
+                self.completed += delta
+            else:
+                counts = self.by_priority if kind == "priority" else self.completed_by_day
+                value = counts.get(key, 0) + delta
+                if value:
+                    counts[key] = value
+                else:
+                    counts.pop(key, None)
+    
+    def update(self, old: Optional[Task], new: Optional[Task]):
+        self.apply(self.deltas(old, new))
+    
+    def snapshot(self) -> Dict:
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "pending": self.pending,
+            "by_priority": dict(self.by_priority),
+            "completed_by_day": dict(self.completed_by_day)
+        }
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase search tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class SearchIndex:
+    """Inverted index from description tokens to the IDs of matching tasks
+    
+    Queries are whitespace-separated terms that must all match; `OR`
+    separates alternatives and a trailing `*` makes a term a prefix
+    search, e.g. "buy milk OR groc*".
+    """
+    
+    def __init__(self):
+        # token -> {task_id: occurrences in that task's description}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Sorted tokens, so a prefix maps to one contiguous slice
+        self._vocabulary: List[str] = []
+        self.doc_count = 0
+    
+    def add(self, task_id: int, text: str):
+        for token in tokenize(text):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            postings[task_id] = postings.get(task_id, 0) + 1
+        self.doc_count += 1
+    
+    def remove(self, task_id: int, text: str):
+        for token in set(tokenize(text)):
+            postings = self._postings.get(token)
+            if postings is None or postings.pop(task_id, None) is None:
+                continue
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+        self.doc_count -= 1
+    
+    def _postings_for(self, term: str) -> List[Dict[int, int]]:
+        """Postings for an exact term, or for every token a `prefix*` covers"""
+        if not term.endswith("*"):
+            postings = self._postings.get(term)
+            return [postings] if postings else []
+        prefix = term[:-1]
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches = []
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches.append(self._postings[token])
+        return matches
+    
+    def _group_scores(self, group: List[Dict[int, int]],
+                      candidates: Optional[Dict[int, float]] = None) -> Dict[int, float]:
+        """TF-IDF score of each task matching one term's postings, only among
+        `candidates` when given (probing the postings rather than walking them)"""
+        scores: Dict[int, float] = {}
+        for postings in group:
+            idf = math.log(1 + self.doc_count / len(postings))
+            if candidates is None:
+                items = postings.items()
+            elif len(candidates) < len(postings):
+                items = ((task_id, postings[task_id]) for task_id in candidates if task_id in postings)
+            else:
+                items = ((task_id, count) for task_id, count in postings.items() if task_id in candidates)
+            for task_id, count in items:
+                scores[task_id] = scores.get(task_id, 0.0) + count * idf
+        return scores
+    
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """Task IDs matching `query`, best match first"""
+        clauses = []
+        for clause in re.split(r"\s+OR\s+", query.strip()):
+            terms = [token + ("*" if raw.endswith("*") else "")
+                     for raw in clause.split() for token in tokenize(raw)]
+            if terms:
+                # Rarest term first: only its matches are ever scored or probed for
+                groups = sorted((self._postings_for(term) for term in terms),
+                                key=lambda group: sum(map(len, group)))
+                if groups[0]:
+                    clauses.append(groups)
+        if len(clauses) == 1 and len(clauses[0]) == 1 and len(clauses[0][0]) == 1:
+            # A lone exact term has one idf, so ranking by count is ranking by
+            # score: take the highest counts first, largest ID first within each
+            postings = clauses[0][0][0]
+            levels = sorted(set(postings.values()), reverse=True)
+            ranked: List[int] = []
+            for count in levels:
+                if len(ranked) >= limit:
+                    break
+                ids = postings if len(levels) == 1 else [
+                    task_id for task_id, n in postings.items() if n == count]
+                ranked += sorted(ids)[:-limit + len(ranked) - 1:-1]
+            return ranked
+        
+        totals: Dict[int, float] = {}
+        for groups in clauses:
+            matches = self._group_scores(groups[0])
+            for group in groups[1:]:
+                scores = self._group_scores(group, matches)
+                matches = {task_id: score + scores[task_id]
+                           for task_id, score in matches.items() if task_id in scores}
+                if not matches:
+                    break
+            for task_id, score in matches.items():
+                totals[task_id] = max(totals.get(task_id, 0.0), score)
+        best = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1], item[0]))
+        return [task_id for task_id, _ in best]
+
+class SQLiteSearchIndex(SearchIndex):
+    """SearchIndex whose postings live in the task_terms table"""
+    
+    def __init__(self, store: "SQLiteTaskStore"):
+        super().__init__()
+        self.store = store
+    
+    @property
+    def doc_count(self) -> int:
+        return self.store.stats.total
+    
+    @doc_count.setter
+    def doc_count(self, value: int):
+        pass  # Derived from the store's counters
+    
+    def add(self, task_id: int, text: str):
+        counts: Dict[str, int] = {}
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        self.store._conn.executemany(
+            "INSERT OR REPLACE INTO task_terms VALUES (?, ?, ?)",
+            [(token, task_id, count) for token, count in counts.items()]
+        )
+    
+    def remove(self, task_id: int, text: str):
+        self.store._conn.executemany(
+            "DELETE FROM task_terms WHERE term = ? AND task_id = ?",
+            [(token, task_id) for token in set(tokenize(text))]
+        )
+    
+    def _postings_for(self, term: str) -> List[Dict[int, int]]:
+        conn = self.store._conn
+        if not term.endswith("*"):
+            rows = conn.execute(
+                "SELECT task_id, count FROM task_terms WHERE term = ?", (term,)
+            )
+            postings = dict(rows)
+            return [postings] if postings else []
+        # Every token with the prefix sorts in [prefix, prefix + U+10FFFF)
+        prefix = term[:-1]
+        rows = conn.execute(
+            "SELECT term, task_id, count FROM task_terms WHERE term >= ? AND term < ?",
+            (prefix, prefix + "\U0010ffff")
+        )
+        by_token: Dict[str, Dict[int, int]] = {}
+        for token, task_id, count in rows:
+            by_token.setdefault(token, {})[task_id] = count
+        return list(by_token.values())
+
+class DueQueue:
+    """Min-heap of open tasks keyed on (due_at, priority rank)
+    
+    Completed and deleted tasks are not removed from the heap; their
+    entries are skipped when they surface, and the heap is rebuilt once
+    stale entries outnumber live ones.
+    """
+    
+    def __init__(self, lookup: Callable[[int], Optional[Task]]):
+        self._lookup = lookup
+        self._heap: List[Tuple[int, int, int]] = []
+        self._stale = 0
+    
+    def _is_live(self, entry: Tuple[int, int, int]) -> bool:
+        task = self._lookup(entry[2])
+        return (task is not None and not task.completed
+                and task.due_at == entry[0] and task.priority == entry[1])
+    
+    def push(self, task: Task):
+        if task.due_at is not None and not task.completed:
+            heapq.heappush(self._heap, (task.due_at, task.priority, task.id))
+    
+    def discard(self, task: Task):
+        """Note that a queued task was completed or deleted"""
+        if task.due_at is None:
+            return
+        self._stale += 1
+        if self._stale > len(self._heap) // 2:
+            self._heap = list({entry for entry in self._heap if self._is_live(entry)})
+            heapq.heapify(self._heap)
+            self._stale = 0
+    
+    def _pop_live(self, until: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+        """Pop live entries in order (optionally only those due before `until`)"""
+        while self._heap:
+            if until is not None and self._heap[0][0] >= until:
+                return
+            entry = heapq.heappop(self._heap)
+            if self._is_live(entry):
+                yield entry
+            else:
+                self._stale = max(0, self._stale - 1)
+    
+    def smallest(self, k: int, until: Optional[int] = None) -> List[int]:
+        """IDs of up to k earliest-due open tasks, in O(k log n) amortized"""
+        if k <= 0:
+            return []
+        taken = []
+        seen = set()
+        for entry in self._pop_live(until):
+            if entry[2] in seen:
+                # A second entry for the same task (journal replay re-adds
+                # tasks); dropping it cleans the heap as it goes
+                continue
+            seen.add(entry[2])
+            taken.append(entry)
+            if len(taken) == k:
+                break
+        for entry in taken:
+            heapq.heappush(self._heap, entry)
+        return [entry[2] for entry in taken]
+
+class MemoryTaskStore:
+    """Tasks held in memory with ID, priority and status indexes,
+    persisted to a JSON file (optionally through a TaskJournal)"""
+    
+    def __init__(self, filename: str = "todos.json", journal: bool = False,
+                 sync_every: int = 64, compact_every: int = 10_000):
+        self.filename = filename
+        # In journal mode `filename` holds a periodic snapshot and every change
+        # is appended to `filename.log`, so saving never rewrites all tasks.
+        self.journal = TaskJournal(filename + ".log", sync_every) if journal else None
+        self.compact_every = compact_every
+        # Tasks keyed by ID. Dicts keep insertion order, so this doubles as
+        # the ordered task list while giving O(1) lookups and deletes.
+        self._tasks_by_id: Dict[int, Task] = {}
+        # Secondary indexes: priority -> {id: task}, completed -> {id: task}
+        self._by_priority: Dict[Priority, Dict[int, Task]] = {}
+        self._by_completed: Dict[bool, Dict[int, Task]] = {False: {}, True: {}}
+        # The next free ID lives in `filename.meta`; the task list alone
+        # cannot tell it once the newest task has been deleted
+        self.meta_filename = filename + ".meta"
+        self.ids = IdAllocator()
+        # Rebuilt as tasks are indexed on load, then kept current
+        self.stats = TaskStats()
+        self.search_index = SearchIndex()
+        self.due_queue = DueQueue(self._tasks_by_id.get)
+    
+    def __len__(self) -> int:
+        return len(self._tasks_by_id)
+    
+    def _index_task(self, task: Task):
+        """Add a task to the primary and secondary indexes"""
+        task_id = task.id
+        self._tasks_by_id[task_id] = task
+        self._by_priority.setdefault(task.priority, {})[task_id] = task
+        self._by_completed[task.completed][task_id] = task
+        self.ids.observe(task_id)
+        self.stats.update(None, task)
+        self.search_index.add(task_id, task.description)
+        self.due_queue.push(task)
+    
+    def _unindex_task(self, task: Task):
+        """Remove a task from the primary and secondary indexes"""
+        task_id = task.id
+        del self._tasks_by_id[task_id]
+        del self._by_priority[task.priority][task_id]
+        del self._by_completed[task.completed][task_id]
+        self.stats.update(task, None)
+        self.search_index.remove(task_id, task.description)
+        if not task.completed:
+            self.due_queue.discard(task)
+    
+    def _set_tasks(self, tasks: Iterable[Task]) -> List[Task]:
+        """Replace all tasks and rebuild the indexes; tasks whose ID is
+        already taken are left out and returned"""
+        self._tasks_by_id = {}
+        self._by_priority = {}
+        self._by_completed = {False: {}, True: {}}
+        self.ids = IdAllocator()
+        self.stats = TaskStats()
+        self.search_index = SearchIndex()
+        self.due_queue = DueQueue(self._tasks_by_id.get)
+        duplicates = []
+        for task in tasks:
+            if task.id in self._tasks_by_id:
+                duplicates.append(task)
+            else:
+                self._index_task(task)
+        return duplicates
+    
+    def load(self) -> bool:
+        """Load the snapshot and replay the journal; False if nothing was stored"""
+        found = os.path.exists(self.filename)
+        duplicates: List[Task] = []
+        if found:
+            try:
+                with open(self.filename, 'r') as f:
+                    # The hook turns each record into a Task as it is parsed,
+                    # so the full list of dicts never exists at once
+                    duplicates = self._set_tasks(json.load(f, object_hook=Task.from_dict))
+            except json.JSONDecodeError:
+                self._set_tasks([])
+                raise
+        if os.path.exists(self.meta_filename):
+            with open(self.meta_filename, 'r') as f:
+                self.ids.observe(json.load(f)["next_id"] - 1)
+        # Files from before IDs were allocated centrally can repeat an ID;
+        # keep every task by giving the later copies fresh IDs
+        for task, task_id in zip(duplicates, self.ids.reserve(len(duplicates))):
+            task.id = task_id
+            self._index_task(task)
+        
+        if self.journal is not None:
+            for record in self.journal.replay():
+                self._apply(record)
+            found = found or self.journal.record_count > 0
+            if duplicates:
+                self.compact()  # Persist the new IDs before anything refers to them
+        return found
+    
+    def _apply(self, record: Dict):
+        """Apply one journal record; replaying a record twice is harmless"""
+        op = record["op"]
+        if op == "add":
+            existing = self._tasks_by_id.get(record["task"]["id"])
+            if existing is not None:
+                self._unindex_task(existing)
+            self._index_task(Task.from_dict(record["task"]))
+        elif op == "complete":
+            task = self._tasks_by_id.get(record["id"])
+            if task is not None and not task.completed:
+                self._mark_completed(task, parse_timestamp(record["at"]))
+        elif op == "delete":
+            task = self._tasks_by_id.get(record["id"])
+            if task is not None:
+                self._unindex_task(task)
+    
+    def _log(self, record: Dict):
+        """Journal a change, compacting once the log grows long enough"""
+        if self.journal is None:
+            return
+        self.journal.append(record)
+        if self.journal.record_count >= self.compact_every:
+            self.compact()
+    
+    def compact(self):
+        """Fold the journal into a fresh snapshot and empty the log"""
+        if self.journal is None:
+            return
+        self.journal.sync()
+        self._save_meta()
+        # A crash before the truncate just replays records that are already
+        # in the snapshot, which _apply tolerates.
+        write_atomically(self.filename, json.dumps(
+            [task.to_dict() for task in self._tasks_by_id.values()], separators=(',', ':')
+        ))
+        self.journal.truncate()
+    
+    def _save_meta(self):
+        write_atomically(self.meta_filename, json.dumps({"next_id": self.ids.next_id}))
+    
+    def save(self) -> str:
+        """Persist outstanding changes and return where they went"""
+        if self.journal is not None:
+            self.journal.sync()
+            return self.journal.path
+        
+        with open(self.filename, 'w') as f:
+            json.dump([task.to_dict() for task in self._tasks_by_id.values()], f, indent=2)
+        self._save_meta()
+        return self.filename
+    
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+    
+    def allocate_ids(self, count: int = 1) -> range:
+        # Journaled adds record their IDs, and the meta file is written on
+        # every save or compaction, so reserved IDs are never handed out twice
+        return self.ids.reserve(count)
+    
+    def get(self, task_id: int) -> Optional[Task]:
+        return self._tasks_by_id.get(task_id)
+    
+    def add(self, task: Task):
+        self._index_task(task)
+        self._log({"op": "add", "task": task.to_dict()})
+    
+    def add_many(self, tasks: List[Task]):
+        for task in tasks:
+            self.add(task)
+    
+    def _mark_completed(self, task: Task, completed_at: int):
+        task_id = task.id
+        self.stats.update(task, None)
+        del self._by_completed[False][task_id]
+        task.completed = True
+        task.completed_at = completed_at
+        self._by_completed[True][task_id] = task
+        self.stats.update(None, task)
+        self.due_queue.discard(task)
+    
+    def mark_completed(self, task_id: int, completed_at: int):
+        self._mark_completed(self._tasks_by_id[task_id], completed_at)
+        self._log({"op": "complete", "id": task_id, "at": format_timestamp(completed_at)})
+    
+    def delete(self, task_id: int):
+        self._unindex_task(self._tasks_by_id[task_id])
+        self._log({"op": "delete", "id": task_id})
+    
+    def iter_tasks(self, show_completed: bool = True) -> Iterator[Task]:
+        # The pending index already holds just the tasks we need, in order
+        tasks = self._tasks_by_id if show_completed else self._by_completed[False]
+        return iter(tasks.values())
+    
+    def iter_priority(self, priority: Priority) -> Iterator[Task]:
+        return iter(self._by_priority.get(priority, {}).values())
+    
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        return self.search_index.search(query, limit)
+    
+    def next_due(self, k: int) -> List[int]:
+        return self.due_queue.smallest(k)
+    
+    def overdue(self, now: datetime, limit: Optional[int] = None) -> List[int]:
+        return self.due_queue.smallest(len(self) if limit is None else limit, until=to_timestamp(now))
+
+class SQLiteTaskStore:
+    """Tasks stored in a SQLite database and queried through its indexes,
+    so nothing is loaded up front"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            priority TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            completed_at TEXT,
+            due_at TEXT,
+            recurrence TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority, id);
+        CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed, id);
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at);
+        CREATE TABLE IF NOT EXISTS task_stats (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS task_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS task_terms (
+            term TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (term, task_id)
+        ) WITHOUT ROWID;
+    """
+    # Run after columns added since the first schema have been migrated in
+    DUE_INDEX = """
+        CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (completed, due_at)
+        WHERE due_at IS NOT NULL
+    """
+    COLUMNS = "id, description, completed, priority, created_at, completed_at, due_at, recurrence"
+    PRIORITY_ORDER = "CASE priority WHEN 'high' THEN 0 WHEN 'low' THEN 2 ELSE 1 END"
+    
+    def __init__(self, filename: str = "todos.db"):
+        self.filename = filename
+        self._conn = None
+        # Mirrors the task_stats table, which is updated in the same
+        # transaction as every change so the counters survive restarts
+        self.stats = TaskStats()
+        self.search_index = SQLiteSearchIndex(self)
+        # Mirrors the next_id row of task_meta
+        self.ids = IdAllocator()
+    
+    def load(self) -> bool:
+        """Open the database; False if it had to be created"""
+        found = os.path.exists(self.filename)
+        self._conn = sqlite3.connect(self.filename)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only syncs at checkpoints, keeping commits cheap
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+        row = self._conn.execute("SELECT value FROM task_meta WHERE key = 'next_id'").fetchone()
+        if row is None:
+            # Older databases: nothing above the current maximum was ever used
+            row = self._conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tasks").fetchone()
+        self.ids = IdAllocator(row[0])
+        self.stats = TaskStats()
+        rows = self._conn.execute("SELECT kind, key, value FROM task_stats").fetchall()
+        if not rows:
+            rows = self._rebuild_stats()
+        self.stats.apply({(kind, key): value for kind, key, value in rows})
+        if self.stats.total and self._conn.execute(
+                "SELECT 1 FROM task_terms LIMIT 1").fetchone() is None:
+            self._rebuild_terms()
+        return found
+    
+    def _migrate(self):
+        """Add columns missing from databases created by older versions"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        with self._conn:
+            for column in ("due_at", "recurrence"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} TEXT")
+            self._conn.execute(self.DUE_INDEX)
+    
+    def _rebuild_terms(self):
+        """Index every description once, for databases created before task_terms"""
+        with self._conn:
+            for task_id, description in self._conn.execute(
+                    "SELECT id, description FROM tasks").fetchall():
+                self.search_index.add(task_id, description)
+    
+    def _rebuild_stats(self) -> List[Tuple[str, str, int]]:
+        """Count everything once, for databases created before task_stats"""
+        query = """
+            SELECT 'total', '', COUNT(*) FROM tasks
+            UNION ALL
+            SELECT 'completed', '', COUNT(*) FROM tasks WHERE completed = 1
+            UNION ALL
+            SELECT 'priority', priority, COUNT(*) FROM tasks GROUP BY priority
+            UNION ALL
+            SELECT 'completed_on', substr(completed_at, 1, 10), COUNT(*) FROM tasks
+            WHERE completed = 1 AND completed_at IS NOT NULL GROUP BY 2
+        """
+        rows = [row for row in self._conn.execute(query) if row[2]]
+        with self._conn:
+            self._conn.executemany("INSERT INTO task_stats VALUES (?, ?, ?)", rows)
+        return rows
+    
+    def _write_stats(self, changes: Dict[Tuple[str, str], int]) -> Dict[Tuple[str, str], int]:
+        """Persist counter changes; call inside the change's transaction"""
+        self._conn.executemany(
+            "INSERT INTO task_stats VALUES (?, ?, ?) "
+            "ON CONFLICT (kind, key) DO UPDATE SET value = value + excluded.value",
+            [(kind, key, delta) for (kind, key), delta in changes.items()]
+        )
+        # A counter that drops to zero disappears, as it does in TaskStats
+        self._conn.executemany(
+            "DELETE FROM task_stats WHERE kind = ? AND key = ? AND value = 0", changes
+        )
+        return changes
+    
+    def save(self) -> str:
+        self._conn.commit()
+        return self.filename
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    @staticmethod
+    def _row_to_task(row) -> Task:
+        return Task(row[0], row[1], Priority.from_stored(row[3]), parse_timestamp(row[4]),
+                    bool(row[2]), parse_timestamp(row[5]), parse_timestamp(row[6]), row[7])
+    
+    def __len__(self) -> int:
+        return self.stats.total
+    
+    def allocate_ids(self, count: int = 1) -> range:
+        ids = self.ids.reserve(count)
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO task_meta VALUES ('next_id', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (self.ids.next_id,)
+            )
+        return ids
+    
+    def get(self, task_id: int) -> Optional[Task]:
+        row = self._conn.execute(
+            f"SELECT {self.COLUMNS} FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        return self._row_to_task(row) if row else None
+    
+    def add(self, task: Task):
+        self.add_many([task])
+    
+    def add_many(self, tasks: List[Task]):
+        """Insert a batch of tasks in one transaction"""
+        changes: Dict[Tuple[str, str], int] = {}
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO tasks ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(task.id, task.description, int(task.completed), task.priority.label,
+                  format_timestamp(task.created_at), format_timestamp(task.completed_at),
+                  format_timestamp(task.due_at), task.recurrence) for task in tasks]
+            )
+            for task in tasks:
+                for key, delta in TaskStats.deltas(None, task).items():
+                    changes[key] = changes.get(key, 0) + delta
+                self.search_index.add(task.id, task.description)
+            self._write_stats(changes)
+        self.stats.apply(changes)
+    
+    def mark_completed(self, task_id: int, completed_at: int):
+        old = self.get(task_id)
+        new = copy.copy(old)
+        new.completed = True
+        new.completed_at = completed_at
+        with self._conn:
+            self._conn.execute(
+                "UPDATE tasks SET completed = 1, completed_at = ? WHERE id = ?",
+                (format_timestamp(completed_at), task_id)
+            )
+            changes = self._write_stats(TaskStats.deltas(old, new))
+        self.stats.apply(changes)
+    
+    def delete(self, task_id: int):
+        old = self.get(task_id)
+        with self._conn:
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            changes = self._write_stats(TaskStats.deltas(old, None))
+            self.search_index.remove(task_id, old.description)
+        self.stats.apply(changes)
+    
+    def iter_tasks(self, show_completed: bool = True) -> Iterator[Task]:
+        where = "" if show_completed else "WHERE completed = 0"
+        cursor = self._conn.execute(f"SELECT {self.COLUMNS} FROM tasks {where} ORDER BY id")
+        return map(self._row_to_task, cursor)
+    
+    def iter_priority(self, priority: Priority) -> Iterator[Task]:
+        cursor = self._conn.execute(
+            f"SELECT {self.COLUMNS} FROM tasks WHERE priority = ? ORDER BY id", (priority.label,)
+        )
+        return map(self._row_to_task, cursor)
+    
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        return self.search_index.search(query, limit)
+    
+    def next_due(self, k: int) -> List[int]:
+        rows = self._conn.execute(
+            "SELECT id FROM tasks WHERE completed = 0 AND due_at IS NOT NULL "
+            f"ORDER BY due_at, {self.PRIORITY_ORDER}, id LIMIT ?", (max(k, 0),)
+        )
+        return [row[0] for row in rows]
+    
+    def overdue(self, now: datetime, limit: Optional[int] = None) -> List[int]:
+        rows = self._conn.execute(
+            "SELECT id FROM tasks WHERE completed = 0 AND due_at IS NOT NULL AND due_at < ? "
+            f"ORDER BY due_at, {self.PRIORITY_ORDER}, id LIMIT ?",
+            (now.isoformat(), -1 if limit is None else limit)
+        )
+        return [row[0] for row in rows]
 
 class TodoManager:
     """A comprehensive to-do list manager"""
     
-    def __init__(self, filename: str = "todos.json"):
-        self.filename = filename
-        self.tasks: List[Dict] = []
+    def __init__(self, filename: str = "todos.json", journal: bool = False,
+                 sync_every: int = 64, compact_every: int = 10_000, store=None,
+                 verbose: bool = True):
+        # Any object with the MemoryTaskStore/SQLiteTaskStore methods will do;
+        # by default tasks live in memory and are saved to `filename`.
+        if store is None:
+            store = MemoryTaskStore(filename, journal, sync_every, compact_every)
+        self.store = store
+        self.filename = store.filename
+        self.verbose = verbose
         self.load_tasks()
     
-    def load_tasks(self):
-        """Load tasks from JSON file"""
-        if os.path.exists(self.filename):
+    def _say(self, message: str):
+        """Report what happened (silenced when driven by TodoService)"""
+        if self.verbose:
+            print(message)
+    
+    @property
+    def tasks(self) -> List[Task]:
+        """All tasks in insertion order"""
+        return list(self.store.iter_tasks())
+    
+    def get_task(self, task_id: int) -> Optional[Task]:
+        """Look up a task by ID"""
+        return self.store.get(task_id)
+    
+    def tasks_with_priority(self, priority: str) -> Iterator[Task]:
+        """Iterate over the tasks with the given priority"""
+        try:
+            return self.store.iter_priority(Priority.parse(priority))
+        except ValueError:
+            return iter(())
+    
+    def search(self, query: str, limit: int = 10) -> List[Task]:
+        """Find tasks whose descriptions match `query`, best match first
+        
+        Terms must all match; use OR for alternatives and `word*` for prefixes.
+        """
+        return [self.store.get(task_id) for task_id in self.store.search(query, limit)]
+    
+    def next_due(self, k: int = 5) -> List[Task]:
+        """The k open tasks due soonest, ties broken by priority"""
+        return [self.store.get(task_id) for task_id in self.store.next_due(k)]
+    
+    def overdue(self, now: Optional[datetime] = None) -> List[Task]:
+        """Open tasks whose due date has passed, most overdue first"""
+        now = now or datetime.now()
+        return [self.store.get(task_id) for task_id in self.store.overdue(now)]
+    
+    def export(self, path: str, format: str = "csv") -> int:
+        """Stream every task to a CSV or NDJSON file (gzipped if path ends in .gz)"""
+        if format not in ("csv", "ndjson"):
+            raise ValueError(f"Unknown export format: {format}")
+        
+        start = time.perf_counter()
+        count = 0
+        with open_text(path, "w") as f:
+            if format == "csv":
+                writer = csv.DictWriter(f, fieldnames=TASK_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                for task in self.store.iter_tasks():
+                    writer.writerow(task.to_dict())
+                    count += 1
+            else:
+                for task in self.store.iter_tasks():
+                    f.write(json.dumps(task.to_dict(), separators=(',', ':')) + "\n")
+                    count += 1
+        
+        elapsed = time.perf_counter() - start
+        self._say(f"Exported {count} tasks to {path} ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+        return count
+    
+    @staticmethod
+    def _read_records(path: str, format: str) -> Iterator[Dict]:
+        """Yield raw task records one at a time"""
+        with open_text(path, "r") as f:
+            if format == "csv":
+                for row in csv.DictReader(f):
+                    # CSV has no nulls or booleans; map them back
+                    record = {key: (value if value != "" else None) for key, value in row.items()}
+                    record["completed"] = record.get("completed") == "True"
+                    yield record
+            else:
+                for line in f:
+                    if line.strip():
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            record = None
+                        # Malformed lines come through as None and are skipped
+                        yield record if isinstance(record, dict) else None
+    
+    def import_(self, path: str, format: str = "csv", batch_size: int = 1000) -> int:
+        """Stream tasks in from a CSV or NDJSON export, inserting them in batches
+        
+        Imported tasks get freshly reserved IDs so they never collide with
+        existing ones.
+        """
+        if format not in ("csv", "ndjson"):
+            raise ValueError(f"Unknown import format: {format}")
+        
+        def flush(batch: List[Task]):
+            # One reservation per batch instead of one ID allocation per task
+            for task, task_id in zip(batch, self.store.allocate_ids(len(batch))):
+                task.id = task_id
+            self.store.add_many(batch)
+        
+        start = time.perf_counter()
+        count = skipped = 0
+        batch: List[Task] = []
+        for record in self._read_records(path, format):
             try:
-                with open(self.filename, 'r') as f:
-                    self.tasks = json.load(f)
-                print(f"Loaded {len(self.tasks)} tasks from {self.filename}")
-            except (json.JSONDecodeError, FileNotFoundError):
-                print("Error loading tasks. Starting with empty list.")
-                self.tasks = []
+                if record is None:
+                    raise ValueError("malformed row")
+                description = (record.get("description") or "").strip()
+                if not description:
+                    raise ValueError("empty description")
+                task = Task.from_dict(dict(record, id=0, description=description))
+                # The same rule add_task enforces; complete_task relies on it
+                if task.recurrence and (task.recurrence not in RECURRENCES or task.due_at is None):
+                    raise ValueError("bad recurrence")
+            except (ValueError, TypeError):
+                skipped += 1
+                continue
+            if not task.completed:
+                task.completed_at = None
+            batch.append(task)
+            if len(batch) >= batch_size:
+                flush(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            flush(batch)
+            count += len(batch)
+        
+        elapsed = time.perf_counter() - start
+        self._say(f"Imported {count} tasks from {path} ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+        if skipped:
+            self._say(f"Skipped {skipped} rows with a missing description or bad field")
+        return count
+    
+    def load_tasks(self):
+        """Load tasks from the task store"""
+        try:
+            found = self.store.load()
+        except (json.JSONDecodeError, sqlite3.DatabaseError):
+            self._say("Error loading tasks. Starting with empty list.")
+            return
+        
+        if found:
+            self._say(f"Loaded {len(self.store)} tasks from {self.filename}")
         else:
-            print("No existing task file found. Starting fresh!")
+            self._say("No existing task file found. Starting fresh!")
+    
+    def compact(self):
+        """Fold the journal (if any) into a fresh snapshot"""
+        if hasattr(self.store, "compact"):
+            self.store.compact()
     
     def save_tasks(self):
-        """Save tasks to JSON file"""
+        """Save tasks to the task store"""
         try:
-            with open(self.filename, 'w') as f:
-                json.dump(self.tasks, f, indent=2)
-            print(f"Tasks saved to {self.filename}")
+            location = self.store.save()
+            self._say(f"Tasks saved to {location}")
         except Exception as e:
-            print(f"Error saving tasks: {e}")
+            self._say(f"Error saving tasks: {e}")
     
-    def add_task(self, description: str, priority: str = "medium"):
-        """Add a new task"""
+    def add_task(self, description: str, priority: str = "medium",
+                 due_at: Optional[str] = None, recurrence: Optional[str] = None) -> Optional[Task]:
+        """Add a new task, optionally due at an ISO date/time and recurring"""
         if not description.strip():
-            print("Task description cannot be empty!")
-            return
+            self._say("Task description cannot be empty!")
+            return None
         
-        task = {
-            "id": len(self.tasks) + 1,
-            "description": description.strip(),
-            "completed": False,
-            "priority": priority.lower(),
-            "created_at": datetime.now().isoformat(),
-            "completed_at": None
-        }
+        try:
+            task_priority = Priority.parse(priority)
+        except ValueError:
+            self._say(f"Invalid priority '{priority}'! Use high, medium or low.")
+            return None
         
-        self.tasks.append(task)
-        print(f"Task '{description}' added successfully!")
+        due_timestamp = None
+        if due_at:
+            try:
+                due_timestamp = parse_timestamp(due_at)
+            except (ValueError, OverflowError):
+                self._say(f"Invalid due date '{due_at}'! Use YYYY-MM-DD or YYYY-MM-DDTHH:MM.")
+                return None
+        if recurrence and (recurrence not in RECURRENCES or due_timestamp is None):
+            self._say(f"Recurring tasks need a due date and one of: {', '.join(RECURRENCES)}")
+            return None
+        
+        task = Task(self.store.allocate_ids(1)[0], description.strip(), task_priority,
+                    due_at=due_timestamp, recurrence=recurrence)
+        self.store.add(task)
+        self._say(f"Task '{description}' added successfully!")
+        return task
     
     def view_tasks(self, show_completed: bool = True):
         """Display all tasks"""
-        if not self.tasks:
+        if not len(self.store):
             print("No tasks found!")
             return
         
@@ -63,59 +1167,297 @@ class TodoManager:
         print("YOUR TO-DO LIST")
         print("="*60)
         
-        for task in self.tasks:
-            if not show_completed and task["completed"]:
-                continue
+        for task in self.store.iter_tasks(show_completed):
+            status = "✓" if task.completed else "○"
+            priority = task.priority.name
             
-            status = "✓" if task["completed"] else "○"
-            priority = task["priority"].upper()
+            print(f"{status} [{task.id}] {task.description}")
+            print(f"    Priority: {priority} | Created: {from_timestamp(task.created_at):%Y-%m-%d}")
             
-            print(f"{status} [{task['id']}] {task['description']}")
-            print(f"    Priority: {priority} | Created: {task['created_at'][:10]}")
+            if task.due_at is not None:
+                repeat = f" (repeats {task.recurrence})" if task.recurrence else ""
+                print(f"    Due: {from_timestamp(task.due_at):%Y-%m-%d %H:%M}{repeat}")
             
-            if task["completed"] and task["completed_at"]:
-                print(f"    Completed: {task['completed_at'][:10]}")
+            if task.completed and task.completed_at is not None:
+                print(f"    Completed: {from_timestamp(task.completed_at):%Y-%m-%d}")
             print()
     
-    def complete_task(self, task_id: int):
-        """Mark a task as completed"""
-        for task in self.tasks:
-            if task["id"] == task_id:
-                if task["completed"]:
-                    print(f"Task '{task['description']}' is already completed!")
-                else:
-                    task["completed"] = True
-                    task["completed_at"] = datetime.now().isoformat()
-                    print(f"Task '{task['description']}' marked as completed!")
-                return
+    def complete_task(self, task_id: int) -> bool:
+        """Mark a task as completed; False if it is missing or already done"""
+        task = self.store.get(task_id)
+        if task is None:
+            self._say(f"Task with ID {task_id} not found!")
+            return False
         
-        print(f"Task with ID {task_id} not found!")
+        if task.completed:
+            self._say(f"Task '{task.description}' is already completed!")
+            return False
+        else:
+            now = datetime.now()
+            self.store.mark_completed(task_id, to_timestamp(now))
+            self._say(f"Task '{task.description}' marked as completed!")
+            if task.recurrence:
+                # Only the next occurrence is ever created, when this one is done
+                due_at = next_occurrence(task.due_at, task.recurrence, now)
+                self.add_task(task.description, task.priority.label,
+                              format_timestamp(due_at), task.recurrence)
+            return True
     
-    def delete_task(self, task_id: int):
-        """Delete a task"""
-        for i, task in enumerate(self.tasks):
-            if task["id"] == task_id:
-                description = task["description"]
-                del self.tasks[i]
-                print(f"Task '{description}' deleted successfully!")
-                return
+    def delete_task(self, task_id: int) -> bool:
+        """Delete a task; False if there is no such task"""
+        task = self.store.get(task_id)
+        if task is None:
+            self._say(f"Task with ID {task_id} not found!")
+            return False
         
-        print(f"Task with ID {task_id} not found!")
+        self.store.delete(task_id)
+        self._say(f"Task '{task.description}' deleted successfully!")
+        return True
     
-    def get_stats(self):
-        """Display task statistics"""
-        total = len(self.tasks)
-        completed = sum(1 for task in self.tasks if task["completed"])
-        pending = total - completed
+    def get_stats(self, verbose: bool = True) -> Dict:
+        """Return (and by default display) task statistics"""
+        stats = self.store.stats.snapshot()
+        if not verbose:
+            return stats
+        
+        total = stats["total"]
+        completed = stats["completed"]
         
         print(f"\n=== TASK STATISTICS ===")
         print(f"Total tasks: {total}")
         print(f"Completed: {completed}")
-        print(f"Pending: {pending}")
+        print(f"Pending: {stats['pending']}")
         
         if total > 0:
             completion_rate = (completed / total) * 100
             print(f"Completion rate: {completion_rate:.1f}%")
+        
+        for priority, count in sorted(stats["by_priority"].items()):
+            print(f"  {priority.upper()}: {count}")
+        return stats
+
+class TodoService:
+    """Serves one TodoManager to many clients over a JSON lines protocol
+    
+    Each request is one JSON object per line, e.g. {"op": "add",
+    "description": "Buy milk"}, answered by {"ok": true, "result": ...}.
+    Everything runs on the event loop thread: reads are answered straight
+    from the current in-memory state, which no other code can change
+    while a handler runs, and every mutation goes through a single writer
+    task that applies queued writes in batches and saves (one journal
+    fsync) once per batch before acknowledging them. The save blocks the
+    loop, so reads wait out each batch's fsync rather than overlapping it.
+    If a save fails, that batch's writes are answered with the error and
+    the writer carries on. Use a journaled or SQLite store; a plain JSON
+    store would rewrite the file every batch.
+    """
+    
+    WRITE_OPS = ("add", "complete", "delete")
+    
+    def __init__(self, manager: TodoManager, batch_size: int = 256):
+        self.manager = manager
+        self.batch_size = batch_size
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 8765,
+                    path: Optional[str] = None) -> asyncio.AbstractServer:
+        """Start listening on TCP, or on a Unix socket if `path` is given"""
+        self._writes = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._write_loop())
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle_client, path=path)
+        return await asyncio.start_server(self._handle_client, host, port)
+    
+    async def stop(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        self.manager.store.save()
+    
+    async def _write_loop(self):
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < self.batch_size and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            
+            outcomes = []
+            for request, future in batch:
+                try:
+                    outcomes.append((future, self._apply_write(request), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            try:
+                self.manager.store.save()
+                save_error = None
+            except Exception as e:
+                # Disk full, database locked...: nothing in this batch is durable
+                save_error = e
+            
+            # Acknowledge only once the batch is durable
+            for future, result, error in outcomes:
+                if future.cancelled():
+                    continue
+                error = save_error or error
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+    
+    def _apply_write(self, request: Dict):
+        op = request["op"]
+        if op == "add":
+            task = self.manager.add_task(
+                request["description"], request.get("priority", "medium"),
+                request.get("due_at"), request.get("recurrence")
+            )
+            if task is None:
+                raise ValueError("Invalid task")
+            return task.to_dict()
+        task_id = int(request["id"])
+        done = (self.manager.complete_task(task_id) if op == "complete"
+                else self.manager.delete_task(task_id))
+        if not done:
+            raise ValueError(f"Cannot {op} task {task_id}")
+        return task_id
+    
+    def _read(self, request: Dict):
+        op = request["op"]
+        manager = self.manager
+        if op == "get":
+            task = manager.get_task(int(request["id"]))
+            return task.to_dict() if task else None
+        if op == "view":
+            tasks = manager.store.iter_tasks(request.get("show_completed", True))
+            limit = request.get("limit")
+            if limit is not None:
+                tasks = (task for task, _ in zip(tasks, range(limit)))
+            return [task.to_dict() for task in tasks]
+        if op == "stats":
+            return manager.get_stats(verbose=False)
+        if op == "search":
+            return [task.to_dict() for task in manager.search(request["query"], request.get("limit", 10))]
+        if op == "next_due":
+            return [task.to_dict() for task in manager.next_due(request.get("k", 5))]
+        raise ValueError(f"Unknown op: {op}")
+    
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if request.get("op") in self.WRITE_OPS:
+                        future = asyncio.get_running_loop().create_future()
+                        await self._writes.put((request, future))
+                        result = await future
+                    else:
+                        result = self._read(request)
+                    response = {"ok": True, "result": result}
+                except (ValueError, KeyError, TypeError, AttributeError,
+                        OSError, sqlite3.Error) as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response, separators=(',', ':')).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def serve(filename: str = "todos.json", host: str = "127.0.0.1", port: int = 8765,
+                path: Optional[str] = None):
+    """Run a TodoService over a journaled task store until interrupted"""
+    manager = TodoManager(filename, journal=True, verbose=False)
+    service = TodoService(manager)
+    server = await service.start(host, port, path)
+    print(f"Serving {len(manager.store)} tasks on {path or f'{host}:{port}'}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+        manager.store.close()
+
+async def run_load(host: str = "127.0.0.1", port: int = 8765, clients: int = 100,
+                   requests_per_client: int = 200, write_ratio: float = 0.2) -> Dict:
+    """Hammer a running TodoService and report request latency percentiles"""
+    latencies: List[float] = []
+    
+    async def client(number: int):
+        reader, writer = await asyncio.open_connection(host, port)
+        for i in range(requests_per_client):
+            if random.random() < write_ratio:
+                request = {"op": "add", "description": f"Load test {number}-{i}"}
+            else:
+                request = {"op": "stats"}
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            await reader.readline()
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+        await writer.wait_closed()
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    report = {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+    print(f"{report['requests']} requests from {clients} clients: "
+          f"{report['throughput']:,.0f} req/s, p50 {report['p50_ms']:.2f} ms, "
+          f"p99 {report['p99_ms']:.2f} ms")
+    return report
+
+def measure_task_memory(count: int = 1_000_000):
+    """Compare bytes per task for plain dict records and Task objects"""
+    import tracemalloc
+    
+    def sample_records():
+        # Mimic json.load output: fresh strings for every record
+        for i in range(count):
+            yield json.loads(json.dumps({
+                "id": i + 1,
+                "description": f"Task number {i % 1000}",
+                "completed": i % 3 == 0,
+                "priority": "medium",
+                "created_at": datetime.now().isoformat(),
+                "completed_at": None
+            }))
+    
+    results = {}
+    for label, build in (("dict", lambda: list(sample_records())),
+                         ("Task", lambda: [Task.from_dict(r) for r in sample_records()])):
+        tracemalloc.start()
+        tasks = build()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del tasks
+        results[label] = used / count
+        print(f"{label:>4}: {results[label]:.0f} bytes per task")
+    print(f"Task records use {results['dict'] / results['Task']:.1f}x less memory")
+    return results
+
+def check_due_dates():
+    """Due dates with and without a UTC offset land on the same timeline"""
+    todo_manager = TodoManager(os.devnull, verbose=False)
+    aware = todo_manager.add_task("Offset", due_at="2026-01-01T00:00:00+02:00")
+    utc = todo_manager.add_task("UTC", due_at="2025-12-31T22:00:00Z")
+    local = datetime(2025, 12, 31, 22, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert aware is not None and utc is not None
+    assert aware.due_at == utc.due_at == to_timestamp(local)
+    assert todo_manager.add_task("Bad", due_at="2026-13-01") is None
+    print("Due dates OK")
 
 def get_valid_input(prompt: str, valid_options: List[str]) -> str:
     """Get valid input from user"""
@@ -152,7 +1494,15 @@ def main():
                 "Enter priority (high/medium/low): ", 
                 ["high", "medium", "low"]
             )
-            todo_manager.add_task(description, priority)
+            due_at = input("Enter due date (YYYY-MM-DD, blank for none): ").strip()
+            recurrence = None
+            if due_at:
+                recurrence = get_valid_input(
+                    "Repeat (none/daily/weekly/monthly): ",
+                    ["none", "daily", "weekly", "monthly"]
+                )
+            todo_manager.add_task(description, priority, due_at or None,
+                                  None if recurrence == "none" else recurrence)
         
         elif choice == '2':
             todo_manager.view_tasks(show_completed=True)
@@ -194,7 +1544,19 @@ def main():
             print("Invalid choice! Please select 1-8.")
 
 if __name__ == "__main__":
-    main()
+    # python day_29.py [memory | check | serve [port] | load [port] [clients]]
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "memory":
+        measure_task_memory()
+    elif command == "check":
+        check_due_dates()
+    elif command == "serve":
+        asyncio.run(serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else 8765))
+    elif command == "load":
+        asyncio.run(run_load(port=int(sys.argv[2]) if len(sys.argv) > 2 else 8765,
+                             clients=int(sys.argv[3]) if len(sys.argv) > 3 else 100))
+    else:
+        main()
 
 # EXERCISES:
 # 1. Add due dates to tasks and sort by deadline
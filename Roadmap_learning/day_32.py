@@ -99,8 +99,17 @@ print(f"Result: {message}")
 # ============================================================================
 print("\n=== ADVANCED DECORATORS ===")
 
+import asyncio
+import collections.abc
+import inspect
+import itertools
+import random
 import time
+import types
+import typing
 import functools
+import threading
+from collections import OrderedDict, namedtuple
 
 def timer(func):
     """Decorator that measures function execution time"""
@@ -113,45 +122,188 @@ def timer(func):
         return result
     return wrapper
 
-def retry(max_attempts=3, delay=1):
-    """Decorator with parameters that retries function calls"""
+class RetryBudget:
+    """Retry allowance shared by every function that uses it
+    
+    Each call deposits `ratio` of a retry (up to `capacity`) and each retry
+    spends one, so during an outage retries stay a fraction of traffic
+    instead of multiplying it.
+    """
+    
+    def __init__(self, ratio=0.2, capacity=10):
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = capacity
+        self._lock = threading.Lock()
+    
+    def record_call(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+    
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+def retry(max_attempts=3, delay=1, backoff=1, max_delay=None, jitter=False, budget=None):
+    """Decorator with parameters that retries function calls
+    
+    By default every retry waits `delay` seconds. Opt in to exponential
+    backoff with e.g. backoff=2: the n-th retry then waits delay * backoff**n
+    seconds (capped at max_delay, if given). jitter=True draws the wait
+    uniformly below that ("full jitter") so callers that failed together
+    don't retry together. budget is an optional
+    RetryBudget shared between callers. Coroutine functions are awaited and
+    wait with asyncio.sleep, so they never block the event loop.
+    """
+    def next_delay(attempt, error):
+        """Seconds to wait before the next attempt, or None to give up"""
+        print(f"Attempt {attempt + 1} failed: {error}")
+        if attempt == max_attempts - 1:
+            print(f"All {max_attempts} attempts failed")
+            return None
+        if budget is not None and not budget.try_spend():
+            print("Retry budget exhausted, not retrying")
+            return None
+        wait = delay * backoff ** attempt
+        if max_delay is not None:
+            wait = min(max_delay, wait)
+        if jitter:
+            wait = random.uniform(0, wait)
+        print(f"Retrying in {wait:.2f} seconds...")
+        return wait
+    
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if budget is not None:
+                    budget.record_call()
+                for attempt in range(max_attempts):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        wait = next_delay(attempt, e)
+                        if wait is None:
+                            raise
+                        await asyncio.sleep(wait)
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            if budget is not None:
+                budget.record_call()
             for attempt in range(max_attempts):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    print(f"Attempt {attempt + 1} failed: {e}")
-                    if attempt < max_attempts - 1:
-                        print(f"Retrying in {delay} seconds...")
-                        time.sleep(delay)
-                    else:
-                        print(f"All {max_attempts} attempts failed")
+                    wait = next_delay(attempt, e)
+                    if wait is None:
                         raise
+                    time.sleep(wait)
         return wrapper
     return decorator
 
-def cache(func):
-    """Simple memoization decorator"""
-    cached_results = {}
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+_KWARGS_MARK = object()  # Separates positional from keyword arguments in keys
+
+def _make_key(args, kwargs, typed):
+    """Hashable key from call arguments, without building strings"""
+    key = args
+    if kwargs:
+        # Parameter names are unique strings, so sorting never compares values
+        key += (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+    if typed:
+        key += tuple(type(value) for value in args)
+        key += tuple(type(value) for _, value in sorted(kwargs.items()))
+    elif len(key) == 1 and type(key[0]) in (int, str):
+        return key[0]  # Skip the tuple for the most common single-argument calls
+    return key
+
+def cache(func=None, *, maxsize=128, typed=False, ttl=None):
+    """Memoization decorator with LRU eviction, usable as @cache or @cache(...)
+    
+    maxsize: most results kept (None = unbounded, 0 = no caching).
+    typed: cache arguments of different types separately (1 vs 1.0).
+    ttl: seconds before a cached result expires (None = never).
+    Without a ttl this is functools.lru_cache, whose C implementation no
+    Python wrapper can match; only expiring results need the code below.
+    The wrapper gains cache_info() and cache_clear(), like functools.lru_cache,
+    and cache_stats() with the hit rate.
+    """
+    if func is None:
+        def decorator(f):
+            return cache(f, maxsize=maxsize, typed=typed, ttl=ttl)
+        return decorator
+    
+    if ttl is None:
+        wrapper = functools.lru_cache(maxsize=maxsize, typed=typed)(func)
+        # Copy the methods into __dict__ so functools.wraps on an outer
+        # decorator (timer, log_calls) carries them over as it does ours
+        wrapper.cache_info, wrapper.cache_clear = wrapper.cache_info, wrapper.cache_clear
+        wrapper.cache_stats = functools.partial(_cache_stats, wrapper.cache_info)
+        return wrapper
+    
+    cached_results = OrderedDict()  # key -> (result, expiry)
+    lock = threading.Lock()
+    hits = misses = 0
     
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Create a key from arguments
-        key = str(args) + str(sorted(kwargs.items()))
-        
-        if key in cached_results:
-            print(f"Cache hit for {func.__name__}")
-            return cached_results[key]
+        nonlocal hits, misses
+        if not kwargs and not typed and len(args) == 1 and type(args[0]) in (int, str):
+            key = args[0]
+        else:
+            key = _make_key(args, kwargs, typed)
+        with lock:
+            entry = cached_results.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    cached_results.move_to_end(key)
+                    hits += 1
+                    return entry[0]
+                del cached_results[key]
+            misses += 1
         
-        print(f"Computing {func.__name__}")
+        # Call outside the lock so recursive and concurrent calls don't deadlock
         result = func(*args, **kwargs)
-        cached_results[key] = result
+        if maxsize == 0:
+            return result
+        with lock:
+            cached_results[key] = (result, time.monotonic() + ttl)
+            cached_results.move_to_end(key)
+            if maxsize is not None and len(cached_results) > maxsize:
+                cached_results.popitem(last=False)
         return result
     
+    def cache_info():
+        with lock:
+            return CacheInfo(hits, misses, maxsize, len(cached_results))
+    
+    def cache_clear():
+        nonlocal hits, misses
+        with lock:
+            cached_results.clear()
+            hits = misses = 0
+    
+    wrapper.cache_info = cache_info
+    wrapper.cache_clear = cache_clear
+    wrapper.cache_stats = functools.partial(_cache_stats, cache_info)
     return wrapper
 
+def _cache_stats(cache_info):
+    """Hits, misses, size and hit rate as a dict (a cached function's cache_stats())"""
+    info = cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0
+    }
+
 # Using advanced decorators
 @timer
 @cache
@@ -173,6 +325,38 @@ def unreliable_function():
 print("Testing fibonacci with cache and timer:")
 print(f"fib(10) = {fibonacci(10)}")
 print(f"fib(10) = {fibonacci(10)}")  # Should hit cache
+print(f"Cache info: {fibonacci.cache_info()}")
+print(f"Cache stats: {fibonacci.cache_stats()}")
+
+def benchmark_memoization(n=30, repeats=2_000):
+    """Compare this cache with functools.lru_cache on recursive fibonacci"""
+    def make_fibonacci(decorator):
+        @decorator
+        def fib(k):
+            return k if k < 2 else fib(k - 1) + fib(k - 2)
+        return fib
+    
+    results = {}
+    for name, decorator in (("cache", cache(maxsize=None)),
+                            ("cache(ttl=60)", cache(maxsize=None, ttl=60)),
+                            ("cache(maxsize=16, ttl=60)", cache(maxsize=16, ttl=60)),
+                            ("functools.lru_cache", functools.lru_cache(maxsize=None))):
+        fib = make_fibonacci(decorator)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fib.cache_clear()
+            fib(n)
+        cold = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(repeats * 50):
+            fib(n)
+        hot = (time.perf_counter() - start) / (repeats * 50)
+        results[name] = (cold, hot)
+        print(f"  {name:>25}: fib({n}) from empty {cold * 1e6:7.1f} us, cached call {hot * 1e9:6.0f} ns")
+    return results
+
+print("\nMemoization benchmark:")
+benchmark_memoization()
 
 print("\nTesting retry decorator:")
 try:
@@ -202,29 +386,127 @@ class CallCounter:
     def reset_count(self):
         self.count = 0
 
+class RateLimitExceeded(Exception):
+    """Raised by a non-blocking RateLimiter; retry_after is in seconds"""
+    
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 class RateLimiter:
-    """Decorator class that limits function call rate"""
+    """Decorator class that limits function call rate
+    
+    Allows max_calls per time_window, in bursts of up to max_calls, with
+    O(1) work per call. algorithm is "token_bucket" (tokens refill
+    continuously) or "gcra" (tracks one theoretical arrival time per key;
+    same limits, less state). key(*args, **kwargs) selects a separate limit
+    per caller, e.g. per user. With block=True a call waits for a permit
+    instead of raising RateLimitExceeded.
+    """
     
-    def __init__(self, max_calls=5, time_window=60):
+    def __init__(self, max_calls=5, time_window=60, algorithm="token_bucket", key=None,
+                 block=False, max_keys=10_000):
+        if max_calls < 1:
+            raise ValueError(f"max_calls must be at least 1, got {max_calls}")
+        if time_window <= 0:
+            raise ValueError(f"time_window must be positive, got {time_window}")
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls = []
+        self.interval = time_window / max_calls  # seconds per permit
+        self.key = key
+        self.block = block
+        self.max_keys = max_keys
+        self._acquire = {"token_bucket": self._token_bucket, "gcra": self._gcra}[algorithm]
+        self._states = {}  # key -> [tokens, last update] or theoretical arrival time
+        self._lock = threading.Lock()
+    
+    def _token_bucket(self, state_key, now):
+        tokens, updated = self._states.get(state_key, (self.max_calls, now))
+        tokens = min(self.max_calls, tokens + (now - updated) / self.interval)
+        if tokens >= 1:
+            self._states[state_key] = (tokens - 1, now)
+            return 0.0
+        self._states[state_key] = (tokens, now)
+        return (1 - tokens) * self.interval
+    
+    def _gcra(self, state_key, now):
+        arrival = max(self._states.get(state_key, now), now)
+        burst = self.interval * (self.max_calls - 1)
+        if arrival - now > burst:
+            return arrival - now - burst
+        self._states[state_key] = arrival + self.interval
+        return 0.0
+    
+    def _prune(self, now):
+        """Forget keys whose limit has fully recovered; they behave like new keys"""
+        if self._acquire == self._token_bucket:
+            idle = [k for k, (tokens, updated) in self._states.items()
+                    if tokens + (now - updated) / self.interval >= self.max_calls]
+        else:
+            idle = [k for k, arrival in self._states.items() if arrival <= now]
+        for k in idle:
+            del self._states[k]
+        self.max_keys = max(self.max_keys, 2 * len(self._states))
+    
+    def _try_acquire(self, state_key):
+        """Take a permit if one is free; otherwise return seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            if len(self._states) >= self.max_keys:
+                self._prune(now)
+            wait = self._acquire(state_key, now)
+        if wait and not self.block:
+            raise RateLimitExceeded(
+                f"Rate limit exceeded: {self.max_calls} calls per {self.time_window} seconds", wait)
+        return wait
+    
+    def acquire(self, state_key=None):
+        """Take one permit for state_key, waiting or raising if none is free"""
+        while wait := self._try_acquire(state_key):
+            time.sleep(wait)
+    
+    async def acquire_async(self, state_key=None):
+        """Like acquire, but waits with asyncio.sleep"""
+        while wait := self._try_acquire(state_key):
+            await asyncio.sleep(wait)
     
     def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                await self.acquire_async(self.key(*args, **kwargs) if self.key else None)
+                return await func(*args, **kwargs)
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            now = time.time()
-            # Remove old calls outside the time window
-            self.calls = [call_time for call_time in self.calls 
-                         if now - call_time < self.time_window]
-            
-            if len(self.calls) >= self.max_calls:
-                raise Exception(f"Rate limit exceeded: {self.max_calls} calls per {self.time_window} seconds")
-            
-            self.calls.append(now)
+            self.acquire(self.key(*args, **kwargs) if self.key else None)
             return func(*args, **kwargs)
         return wrapper
 
+def benchmark_rate_limiter(threads=8, calls_per_thread=20_000):
+    """Permits per second with many threads sharing one limiter"""
+    results = {}
+    for algorithm in ("token_bucket", "gcra"):
+        for max_calls in (10, 100_000):
+            # A tiny window keeps permits available, so this measures limiter overhead
+            limiter = RateLimiter(max_calls=max_calls, time_window=1e-9, algorithm=algorithm)
+            
+            def worker():
+                for _ in range(calls_per_thread):
+                    limiter.acquire()
+            
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            start = time.perf_counter()
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+            rate = threads * calls_per_thread / (time.perf_counter() - start)
+            results[(algorithm, max_calls)] = rate
+            print(f"  {algorithm:>12}, max_calls={max_calls:>7,}: {rate:,.0f} permits/s across {threads} threads")
+    return results
+
 # Using class-based decorators
 @CallCounter
 def say_hello(name):
@@ -240,58 +522,280 @@ print(say_hello("Alice"))
 print(say_hello("Bob"))
 print(say_hello("Charlie"))
 
+print("\nTesting rate limiter:")
+for i in range(4):
+    try:
+        print(f"Call {i + 1}: {limited_function()}")
+    except RateLimitExceeded as e:
+        print(f"Call {i + 1}: {e} (retry in {e.retry_after:.2f}s)")
+
+@RateLimiter(max_calls=2, time_window=0.2, algorithm="gcra", key=lambda user: user, block=True)
+def fetch_profile(user):
+    return f"profile of {user}"
+
+start = time.perf_counter()
+for user in ("alice", "alice", "bob", "alice"):
+    fetch_profile(user)
+print(f"3rd call for alice waited for a permit; bob was not limited ({time.perf_counter() - start:.2f}s)")
+
+print("\nRate limiter benchmark:")
+benchmark_rate_limiter(threads=8, calls_per_thread=5_000)
+
+# Async decorators: delays await asyncio.sleep, so coroutines overlap
+print("\nTesting async retry and rate limiter:")
+failures_left = {}
+
+@retry(max_attempts=3, delay=0.1, backoff=2)
+async def flaky_request(name):
+    await asyncio.sleep(0.01)
+    if failures_left.setdefault(name, 2) > 0:
+        failures_left[name] -= 1
+        raise ConnectionError(f"{name} timed out")
+    return f"{name} ok"
+
+@RateLimiter(max_calls=1, time_window=0.2, key=lambda user: user, block=True)
+async def fetch_profile_async(user):
+    return f"profile of {user}"
+
+async def run_async_decorators():
+    start = time.perf_counter()
+    results = await asyncio.gather(flaky_request("A"), flaky_request("B"), flaky_request("C"))
+    elapsed = time.perf_counter() - start
+    # Each request waits 0.1 + 0.2 s; run one after another that would be ~0.9 s
+    print(f"{results} in {elapsed:.2f}s (concurrent: {elapsed < 0.6})")
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch_profile_async(user) for user in ("alice", "alice", "bob", "bob")))
+    elapsed = time.perf_counter() - start
+    print(f"Rate-limited profiles for two users in {elapsed:.2f}s (concurrent: {elapsed < 0.3})")
+
+asyncio.run(run_async_decorators())
+
 # ============================================================================
 # SECTION 6: DECORATOR PATTERNS AND BEST PRACTICES
 # ============================================================================
 print("\n=== DECORATOR PATTERNS ===")
 
-def validate_types(**expected_types):
-    """Decorator that validates function argument types"""
+def _type_name(expected):
+    return expected.__name__ if isinstance(expected, type) else str(expected).replace("typing.", "")
+
+def _compile_check(expected):
+    """Turn a type or typing annotation into a fast predicate, or a plain class
+    when isinstance alone is enough (the caller then skips a function call)"""
+    if expected is typing.Any:
+        return object
+    if expected is None or expected is type(None):
+        return type(None)
+    origin = typing.get_origin(expected)
+    if origin is None:
+        return expected
+    args = typing.get_args(expected)
+    if origin is typing.Annotated:
+        return _compile_check(args[0])
+    if origin is typing.Literal:
+        allowed = {(type(arg), arg) for arg in args}  # Literal[1] must not accept True
+        
+        def is_allowed(value):
+            try:
+                return (type(value), value) in allowed
+            except TypeError:  # unhashable, so not one of the literals
+                return False
+        return is_allowed
+    if origin is typing.Union or origin is types.UnionType:
+        options = [_compile_check(arg) for arg in args]
+        classes = tuple(cls for option in options
+                        for cls in (option if isinstance(option, tuple) else (option,))
+                        if isinstance(cls, type))
+        predicates = [option for option in options if not isinstance(option, (type, tuple))]
+        if not predicates:
+            return classes  # isinstance accepts a tuple of classes
+        if len(predicates) == 1:
+            predicate = predicates[0]
+            return lambda value: isinstance(value, classes) or predicate(value)
+        # One isinstance for every class option before trying the predicates
+        return lambda value: isinstance(value, classes) or any(check(value) for check in predicates)
+    if not isinstance(origin, type):
+        return object  # ClassVar, Final and the like say nothing checkable about the value
+    if not args:
+        return origin
+    if origin is tuple:
+        if len(args) == 2 and args[1] is Ellipsis:
+            item = _compile_check(args[0])
+            return lambda value: isinstance(value, tuple) and all(_matches(v, item) for v in value)
+        items = [_compile_check(arg) for arg in args]
+        return lambda value: (isinstance(value, tuple) and len(value) == len(items)
+                              and all(_matches(v, check) for v, check in zip(value, items)))
+    if issubclass(origin, collections.abc.Mapping):
+        key_check, value_check = (_compile_check(arg) for arg in args)
+        return lambda value: isinstance(value, origin) and all(
+            _matches(k, key_check) and _matches(v, value_check) for k, v in value.items())
+    # Only containers can be walked without consuming them; a generator passed
+    # as Iterable[int] or Iterator[int] gets its type checked and nothing more
+    if issubclass(origin, collections.abc.Collection) and len(args) == 1:
+        item = _compile_check(args[0])
+        if isinstance(item, (type, tuple)):
+            return lambda value: isinstance(value, origin) and all(isinstance(v, item) for v in value)
+        return lambda value: isinstance(value, origin) and all(item(v) for v in value)
+    return origin  # Other generics (Iterable[...], Callable[...], custom classes): the container type only
+
+def _matches(value, check):
+    if isinstance(check, (type, tuple)):
+        return isinstance(value, check)
+    return check(value)
+
+def _signature_source(signature, namespace, prefix):
+    """Source for the parameter list of a def with the same parameters as
+    signature; defaults are stored in namespace"""
+    params = []
+    kinds = [param.kind for param in signature.parameters.values()]
+    for i, (name, param) in enumerate(signature.parameters.items()):
+        default = ""
+        if param.default is not param.empty:
+            namespace[f"{prefix}default_{i}"] = param.default
+            default = f"={prefix}default_{i}"
+        if param.kind == param.VAR_POSITIONAL:
+            params.append(f"*{name}")
+        elif param.kind == param.VAR_KEYWORD:
+            params.append(f"**{name}")
+        elif param.kind == param.KEYWORD_ONLY:
+            if param.VAR_POSITIONAL not in kinds and "*" not in params:
+                params.append("*")
+            params.append(name + default)
+        else:
+            params.append(name + default)
+            if param.kind == param.POSITIONAL_ONLY and param.POSITIONAL_ONLY not in kinds[i + 1:]:
+                params.append("/")
+    return params
+
+def _check_lines(expected_types, every, prefix, namespace):
+    """Source lines raising TypeError unless each named argument matches its
+    type, run on every `every`-th call only if any check is more than isinstance"""
+    # Builtins are bound under the prefix too, so a parameter named `type` can't shadow them
+    namespace.update({f"{prefix}isinstance": isinstance, f"{prefix}type": type,
+                      f"{prefix}TypeError": TypeError})
+    lines = []
+    plain = True
+    for i, (name, expected) in enumerate(expected_types.items()):
+        check = namespace[f"{prefix}check_{i}"] = _compile_check(expected)
+        namespace[f"{prefix}message_{i}"] = f"{name} must be {_type_name(expected)}, got {{}}"
+        if isinstance(check, (type, tuple)):
+            lines.append(f"if not {prefix}isinstance({name}, {prefix}check_{i}):")
+        else:
+            plain = False
+            lines.append(f"if not {prefix}check_{i}({name}):")
+        lines.append(f"    raise {prefix}TypeError({prefix}message_{i}.format({prefix}type({name}).__name__))")
+    if every > 1 and not plain:
+        # A plain isinstance costs less than deciding whether to skip it
+        namespace[f"{prefix}due"] = itertools.cycle((False,) * (every - 1) + (True,)).__next__
+        lines = [f"if {prefix}due():"] + [f"    {line}" for line in lines]
+    return lines
+
+def _compile_checker(name, signature, expected_types, every):
+    """A function with the parameters of signature that raises TypeError
+    unless the validated arguments match; it returns nothing, so callers
+    pass their own *args and **kwargs on untouched"""
+    # Names used by the generated code carry a _vt_ prefix so parameters can't shadow them
+    namespace = {}
+    params = _signature_source(signature, namespace, "_vt_")
+    checks = _check_lines(expected_types, every, "_vt_", namespace) or ["pass"]
+    name = name if name.isidentifier() else "check"
+    exec("\n".join([f"def {name}({', '.join(params)}):"] + [f"    {line}" for line in checks]),
+         namespace)
+    return namespace[name]
+
+def validate_types(every=1, /, **expected_types):
+    """Decorator that validates function argument types
+    
+    Expected types may be classes or typing annotations such as list[int],
+    dict[str, float] or Optional[int]. At decoration time the signature is
+    compiled into a checker with the same parameters and one inline check
+    per validated argument, so a call costs the checks plus one more
+    argument pass (no inspect, no binding). The function then gets the call
+    exactly as made: keywords stay keywords and defaults are not filled in,
+    which inner decorators reading kwargs rely on. Defaults are validated
+    when used.
+    every=N validates only every N-th call, e.g. @validate_types(100, items=list[int]);
+    arguments checked by isinstance alone are validated on every call anyway,
+    since that is cheaper than counting calls.
+    """
     def decorator(func):
+        signature = inspect.signature(func)
+        unknown = set(expected_types) - set(signature.parameters)
+        if unknown:
+            raise TypeError(f"{func.__name__}() has no parameters named {sorted(unknown)}")
+        
+        check = _compile_checker(func.__name__, signature, expected_types, every)
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Get function signature
-            import inspect
-            sig = inspect.signature(func)
-            bound_args = sig.bind(*args, **kwargs)
-            bound_args.apply_defaults()
-            
-            # Validate types
-            for arg_name, expected_type in expected_types.items():
-                if arg_name in bound_args.arguments:
-                    value = bound_args.arguments[arg_name]
-                    if not isinstance(value, expected_type):
-                        raise TypeError(f"{arg_name} must be {expected_type.__name__}, got {type(value).__name__}")
-            
+            check(*args, **kwargs)
             return func(*args, **kwargs)
         return wrapper
     return decorator
 
+def benchmark_validate_types(calls=100_000):
+    """Per-call cost of validation against the undecorated function"""
+    def area(width, height, unit="m"):
+        return width
+    
+    readings = list(range(20))
+    variants = {
+        "undecorated": (area, 3),
+        "validate_types": (validate_types(width=int, height=int, unit=str)(area), 3),
+        "Optional[int] | list[int]": (validate_types(width=typing.Optional[int],
+                                                     height=typing.Union[int, list[int]])(area), 3),
+        "list[int], 20 items": (validate_types(height=list[int])(area), readings),
+        "list[int], every=100": (validate_types(100, height=list[int])(area), readings)
+    }
+    baseline = None
+    for label, (func, height) in variants.items():
+        start = time.perf_counter_ns()
+        for i in range(calls):
+            func(i, height, unit="cm")
+        per_call = (time.perf_counter_ns() - start) / calls
+        baseline = baseline or per_call
+        print(f"  {label:>26}: {per_call:6.0f} ns/call (+{per_call - baseline:.0f})")
+
+class FormattedCall:
+    """Formats a call as name(arg, key=value) only when converted to str
+    
+    Passing it as a logging argument ("%s") means the reprs are never
+    built when the log level filters the message out.
+    """
+    
+    __slots__ = ("name", "args", "kwargs")
+    
+    def __init__(self, name, args, kwargs):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+    
+    def __str__(self):
+        args_str = ', '.join(repr(arg) for arg in self.args)
+        kwargs_str = ', '.join(f"{k}={v!r}" for k, v in self.kwargs.items())
+        return f"{self.name}({', '.join(filter(None, [args_str, kwargs_str]))})"
+
 def log_calls(logger=None):
     """Decorator that logs function calls"""
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            args_str = ', '.join(repr(arg) for arg in args)
-            kwargs_str = ', '.join(f"{k}={v!r}" for k, v in kwargs.items())
-            all_args = ', '.join(filter(None, [args_str, kwargs_str]))
-            
-            log_message = f"Calling {func.__name__}({all_args})"
             if logger:
-                logger.info(log_message)
+                # Lazy %-style arguments: nothing is formatted if INFO is disabled
+                logger.info("Calling %s", FormattedCall(func.__name__, args, kwargs))
             else:
-                print(f"LOG: {log_message}")
+                print(f"LOG: Calling {FormattedCall(func.__name__, args, kwargs)}")
             
             try:
                 result = func(*args, **kwargs)
                 if logger:
-                    logger.info(f"{func.__name__} returned {result!r}")
+                    logger.info("%s returned %r", func.__name__, result)
                 else:
                     print(f"LOG: {func.__name__} returned {result!r}")
                 return result
             except Exception as e:
                 if logger:
-                    logger.error(f"{func.__name__} raised {e!r}")
+                    logger.error("%s raised %r", func.__name__, e)
                 else:
                     print(f"LOG: {func.__name__} raised {e!r}")
                 raise
@@ -317,6 +821,19 @@ try:
 except Exception as e:
     print(f"Error: {e}")
 
+@validate_types(scores=list[int], nickname=typing.Optional[str])
+def average_score(scores, nickname=None):
+    return sum(scores) / len(scores)
+
+print(f"Average: {average_score([90, 85, 77])}")
+try:
+    average_score([90, "85"], nickname="Al")
+except TypeError as e:
+    print(f"Error: {e}")
+
+print("\nValidation overhead:")
+benchmark_validate_types(calls=50_000)
+
 # ============================================================================
 # SECTION 7: DECORATOR UTILITIES
 # ============================================================================
@@ -354,6 +871,227 @@ print("Testing composed decorators:")
 result = complex_calculation(1000)
 print(f"Result: {result}")
 
+def benchmark_compose(calls=20_000, repeats=5):
+    """Call overhead of a 5-deep decorator stack (best of repeats)
+    
+    compose() nests the wrappers. Fusing the timer, rate limit, retry and
+    validation layers into one generated wrapper was tried and measured no
+    faster: the layers' own work (locks, clocks, logging level checks)
+    dominates the frames it saves.
+    """
+    import logging
+    
+    def area(width, height):
+        return width * height
+    
+    quiet = logging.getLogger("benchmark_compose")
+    quiet.setLevel(logging.WARNING)  # log_calls checks the level and formats nothing
+    
+    def stack():
+        return [validate_types(width=int, height=int),
+                RateLimiter(max_calls=10**9, time_window=1),
+                retry(max_attempts=3, delay=0),
+                log_calls(quiet),
+                cache(maxsize=None)]
+    
+    variants = {
+        "undecorated": area,
+        "5 nested wrappers": compose(*stack())(area)
+    }
+    results = {}
+    for label, func in variants.items():
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            for i in range(calls):
+                func(i % 100, 3)
+            best = min(best, (time.perf_counter_ns() - start) / calls)
+        results[label] = best
+        print(f"  {label:>20}: {best:7.0f} ns/call (+{best - results['undecorated']:.0f})")
+    return results
+
+# Instrumentation without per-call printing
+import io
+from collections import deque
+from contextlib import redirect_stdout
+
+class Instrumentation:
+    """Call counts, latency histograms and recent calls for decorated functions
+    
+    Each thread records into its own buffer, so the hot path takes no lock;
+    stats() merges the buffers on demand, and the buffers of threads that
+    have exited are folded into one. Arguments are kept as objects and
+    formatted only when recent_calls() is read.
+    
+    Setting `enabled` pauses or resumes recording for every instrumented
+    function. A function decorated while instrumentation is disabled is
+    returned unchanged, for zero overhead, and is never recorded, even if
+    instrumentation is enabled later. So enable it before decorating
+    anything you may want to observe.
+    """
+    
+    def __init__(self, enabled=True, recent=100):
+        self.enabled = enabled
+        self.recent = recent
+        self._local = threading.local()
+        self._buffers = {}  # live thread -> its buffer, for aggregation
+        self._retired = self._new_buffer()  # merged buffers of threads that exited
+        self._register_lock = threading.Lock()  # taken once per thread
+    
+    def _new_buffer(self):
+        return {"stats": {}, "calls": deque(maxlen=self.recent)}
+    
+    def _buffer(self):
+        try:
+            return self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = self._new_buffer()
+            with self._register_lock:
+                self._prune()
+                self._buffers[threading.current_thread()] = buffer
+            return buffer
+    
+    @staticmethod
+    def _merge_stats(merged, stats):
+        for label, (calls, total_ns, errors, histogram) in list(stats.items()):
+            entry = merged.setdefault(label, [0, 0, 0, [0] * len(histogram)])
+            entry[0] += calls
+            entry[1] += total_ns
+            entry[2] += errors
+            entry[3] = [a + b for a, b in zip(entry[3], histogram)]
+    
+    def _prune(self):
+        """Fold the buffers of exited threads into _retired (lock held)"""
+        for thread in [thread for thread in self._buffers if not thread.is_alive()]:
+            buffer = self._buffers.pop(thread)
+            self._merge_stats(self._retired["stats"], buffer["stats"])
+            self._retired["calls"].extend(buffer["calls"])
+    
+    def instrument(self, func=None, *, name=None, record_args=False):
+        """Decorator counting calls and timing them with perf_counter_ns
+        
+        record_args: also keep the most recent calls' arguments and results.
+        """
+        if func is None:
+            return lambda f: self.instrument(f, name=name, record_args=record_args)
+        if not self.enabled:
+            return func
+        
+        label = name or func.__qualname__
+        clock = time.perf_counter_ns
+        local = self._local
+        
+        def record(elapsed, args, kwargs, result, error):
+            try:
+                buffer = local.buffer
+            except AttributeError:
+                buffer = self._buffer()
+            entry = buffer["stats"].get(label)
+            if entry is None:
+                entry = buffer["stats"][label] = [0, 0, 0, [0] * 64]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[3][elapsed.bit_length()] += 1  # power-of-two latency buckets
+            if error is not None:
+                entry[2] += 1
+            if record_args:
+                buffer["calls"].append((label, args, kwargs, result, error, elapsed))
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start = clock()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                record(clock() - start, args, kwargs, None, e)
+                raise
+            record(clock() - start, args, kwargs, result, None)
+            return result
+        return wrapper
+    
+    def stats(self):
+        """{name: {"calls", "errors", "total_ms", "mean_us", "histogram"}} over all threads"""
+        merged = {}
+        with self._register_lock:
+            self._prune()
+            for buffer in [self._retired, *self._buffers.values()]:
+                self._merge_stats(merged, buffer["stats"])
+        return {
+            label: {
+                "calls": calls,
+                "errors": errors,
+                "total_ms": total_ns / 1e6,
+                "mean_us": total_ns / calls / 1e3,
+                # Bucket i holds calls faster than 2**i ns
+                "histogram": {f"<{(1 << i) / 1000:g}us": count
+                              for i, count in enumerate(histogram) if count}
+            }
+            for label, (calls, total_ns, errors, histogram) in merged.items()
+        }
+    
+    def recent_calls(self):
+        """The recorded calls, formatted now rather than when they happened"""
+        with self._register_lock:
+            self._prune()
+            calls = [call for buffer in [self._retired, *self._buffers.values()]
+                     for call in list(buffer["calls"])]
+        lines = []
+        for label, args, kwargs, result, error, elapsed in calls:
+            outcome = f"raised {error!r}" if error is not None else f"returned {result!r}"
+            lines.append(f"{FormattedCall(label, args, kwargs)} {outcome} in {elapsed / 1e3:.1f}us")
+        return lines
+    
+    def reset(self):
+        with self._register_lock:
+            for buffer in [self._retired, *self._buffers.values()]:
+                buffer["stats"].clear()
+                buffer["calls"].clear()
+
+instrumentation = Instrumentation()
+instrument = instrumentation.instrument
+
+@instrument(record_args=True)
+def scale(values, factor=2):
+    return [v * factor for v in values]
+
+for factor in range(3):
+    scale([1, 2, 3], factor=factor)
+print("Instrumented calls:", instrumentation.stats()["scale"]["calls"])
+print("Most recent:", instrumentation.recent_calls()[-1])
+
+def benchmark_instrumentation(calls=100_000):
+    """Per-call overhead of the instrumentation against the printing decorators"""
+    def work(x):
+        return x + 1
+    
+    paused = Instrumentation()
+    paused_work = paused.instrument(work)
+    paused.enabled = False
+    variants = {
+        "plain function": work,
+        "instrument()": Instrumentation().instrument(work),
+        "instrument(), disabled": Instrumentation(enabled=False).instrument(work),
+        "instrument(), paused": paused_work,
+        "timer + CallCounter + log_calls": timer(CallCounter(log_calls()(work)))
+    }
+    baseline = None
+    for label, func in variants.items():
+        with redirect_stdout(io.StringIO()):  # Keep the printing decorators' output out of the way
+            start = time.perf_counter_ns()
+            for i in range(calls):
+                func(i)
+            per_call = (time.perf_counter_ns() - start) / calls
+        baseline = baseline or per_call
+        print(f"  {label:>32}: {per_call:8.0f} ns/call (+{per_call - baseline:.0f})")
+
+print("\nInstrumentation overhead:")
+benchmark_instrumentation(calls=20_000)
+
+print("\nComposed decorator overhead:")
+benchmark_compose()
+
 # ============================================================================
 # SECTION 8: EXERCISES
 # ============================================================================
@@ -395,6 +1133,132 @@ try:
 except PermissionError as e:
     print(f"Access denied: {e}")
 
+# Exercise example: Caching results to a file
+import hashlib
+import marshal
+import os
+import pickle
+import sqlite3
+import tempfile
+
+def _function_version(func):
+    """Short hash of a function's source, or of its bytecode if there is no source"""
+    try:
+        code = inspect.getsource(func).encode()
+    except (OSError, TypeError):
+        code = marshal.dumps(func.__code__)
+    return hashlib.sha256(code).hexdigest()[:16]
+
+# What pickle.dumps raises for locks, lambdas, local classes and the like
+_UNPICKLABLE = (pickle.PicklingError, TypeError, AttributeError)
+
+def persistent_cache(path, version=None):
+    """Decorator that memoizes results in a SQLite file so they survive restarts
+    
+    Rows are keyed by the function's qualified name, its version (a hash of
+    its source, or the explicit `version`) and a hash of its pickled
+    arguments, so editing the code invalidates old results even while another
+    process still runs the old version. Rows from other versions are also
+    deleted when the function is decorated, to keep the file small.
+    Arguments should pickle the same way on every run (numbers, strings,
+    tuples); anything else just misses. Calls whose arguments cannot be
+    pickled run uncached, and results that cannot be pickled are returned
+    without being stored.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        func_version = version or _function_version(func)
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        primary_key = [row[1] for row in connection.execute("PRAGMA table_info(results)") if row[5]]
+        if primary_key and "version" not in primary_key:
+            connection.execute("DROP TABLE results")  # Older layout; it is only a cache
+        connection.execute("""CREATE TABLE IF NOT EXISTS results (
+            function TEXT NOT NULL,
+            version TEXT NOT NULL,
+            args_hash BLOB NOT NULL,
+            value BLOB NOT NULL,
+            PRIMARY KEY (function, version, args_hash))""")
+        with connection:
+            connection.execute("DELETE FROM results WHERE function = ? AND version != ?",
+                               (name, func_version))
+        lock = threading.Lock()
+        hits = misses = 0
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal hits, misses
+            try:
+                args_hash = hashlib.sha256(pickle.dumps((args, sorted(kwargs.items())), protocol=4)).digest()
+            except _UNPICKLABLE:
+                with lock:
+                    misses += 1
+                return func(*args, **kwargs)
+            with lock:
+                row = connection.execute(
+                    "SELECT value FROM results WHERE function = ? AND version = ? AND args_hash = ?",
+                    (name, func_version, args_hash)
+                ).fetchone()
+                if row is not None:
+                    hits += 1
+                    return pickle.loads(row[0])
+                misses += 1
+            
+            result = func(*args, **kwargs)
+            try:
+                value = pickle.dumps(result, protocol=4)
+            except _UNPICKLABLE:
+                return result
+            with lock, connection:
+                connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                   (name, func_version, args_hash, value))
+            return result
+        
+        def cache_info():
+            with lock:
+                size = connection.execute("SELECT COUNT(*) FROM results WHERE function = ? AND version = ?",
+                                          (name, func_version)).fetchone()[0]
+                return CacheInfo(hits, misses, None, size)
+        
+        def cache_clear():
+            nonlocal hits, misses
+            with lock, connection:
+                connection.execute("DELETE FROM results WHERE function = ? AND version = ?",
+                                   (name, func_version))
+                hits = misses = 0
+        
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        wrapper.close = connection.close
+        return wrapper
+    return decorator
+
+def slow_prime_factors(n):
+    """Trial-division factorisation, made slow on purpose"""
+    time.sleep(0.05)
+    factors, divisor = [], 2
+    while divisor * divisor <= n:
+        while n % divisor == 0:
+            factors.append(divisor)
+            n //= divisor
+        divisor += 1
+    if n > 1:
+        factors.append(n)
+    return factors
+
+# Testing persistent cache: each "run" decorates the function afresh, as a new process would
+print("\nTesting persistent cache across runs:")
+with tempfile.TemporaryDirectory() as cache_dir:
+    results_path = os.path.join(cache_dir, "results.db")
+    for run, version in ((1, "v1"), (2, "v1"), (3, "v2")):
+        factorise = persistent_cache(results_path, version=version)(slow_prime_factors)
+        start = time.perf_counter()
+        factors = [factorise(n) for n in (360, 9973, 123456)]
+        elapsed = time.perf_counter() - start
+        print(f"Run {run} ({version}): {factors[0]} ... in {elapsed:.3f}s, {factorise.cache_info()}")
+        factorise.close()
+
 print("\n" + "="*50)
 print("Decorators and Closures completed!")
 print("Next: Study context managers and advanced Python features")
@@ -328,29 +328,514 @@ Try these exercises:
 """)
 
 # Exercise example: Simple thread-safe cache
+from collections import OrderedDict, defaultdict
+import bisect
+import itertools
+import random
+import sys
+
+# Eviction policies track key order/frequency for the cache; every method is O(1)
+
+class FIFOPolicy:
+    """Evict the oldest inserted key, ignoring reads"""
+    
+    def __init__(self):
+        self._order = OrderedDict()
+    
+    def record(self, key):
+        """Called on every lookup, hit or miss"""
+    
+    def on_insert(self, key):
+        self._order[key] = None
+    
+    def on_access(self, key):
+        pass
+    
+    def on_remove(self, key):
+        del self._order[key]
+    
+    def victim(self):
+        return next(iter(self._order))
+    
+    def admit(self, candidate, victim):
+        return True
+
+class LRUPolicy(FIFOPolicy):
+    """Evict the least recently used key"""
+    
+    def on_access(self, key):
+        self._order.move_to_end(key)
+
+class LFUPolicy(FIFOPolicy):
+    """Evict the least frequently used key (oldest first among ties)"""
+    
+    def __init__(self):
+        self._freq = {}
+        self._buckets = defaultdict(OrderedDict)  # frequency -> keys
+        self._min_freq = 0
+    
+    def on_insert(self, key):
+        self._freq[key] = 1
+        self._buckets[1][key] = None
+        self._min_freq = 1
+    
+    def on_access(self, key):
+        freq = self._freq[key]
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if self._min_freq == freq:
+                self._min_freq = freq + 1
+        self._freq[key] = freq + 1
+        self._buckets[freq + 1][key] = None
+    
+    def on_remove(self, key):
+        freq = self._freq.pop(key)
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+    
+    def victim(self):
+        if self._min_freq not in self._buckets:
+            # Only after a removal emptied the lowest bucket
+            self._min_freq = min(self._buckets)
+        return next(iter(self._buckets[self._min_freq]))
+
+class CountMinSketch:
+    """Approximate per-key counts in fixed memory
+    
+    Counts are halved every `sample_size` increments so old popularity
+    fades, as TinyLFU prescribes.
+    """
+    
+    def __init__(self, width=1024, depth=4, sample_size=None):
+        self._width = width
+        self._rows = [[0] * width for _ in range(depth)]
+        self._sample_size = sample_size or width * 10
+        self._additions = 0
+        self.resets = 0  # times the counts have been halved
+    
+    def _cells(self, key):
+        # Double hashing: one scrambled hash() gives every row its own index
+        # (hash of a small int is the int itself, so it must be mixed first)
+        mixed = (hash(key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        first, step = mixed & 0xFFFFFFFF, (mixed >> 32) | 1
+        width = self._width
+        return [(row, (first + depth * step) % width) for depth, row in enumerate(self._rows)]
+    
+    def add(self, key):
+        """Count one occurrence of key and return its new estimate"""
+        counts = []
+        for row, index in self._cells(key):
+            count = row[index] = row[index] + 1
+            counts.append(count)
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            for row in self._rows:
+                row[:] = [count >> 1 for count in row]
+            self._additions //= 2
+            self.resets += 1
+        return min(counts)
+    
+    def estimate(self, key):
+        return min(row[index] for row, index in self._cells(key))
+
+class TinyLFUPolicy(LRUPolicy):
+    """LRU eviction behind a TinyLFU admission filter: a new key only
+    replaces the LRU victim if it has been requested more often lately"""
+    
+    def __init__(self, capacity=100):
+        super().__init__()
+        self._sketch = CountMinSketch(width=max(64, capacity * 4))
+    
+    def record(self, key):
+        self._sketch.add(key)
+    
+    def admit(self, candidate, victim):
+        return self._sketch.estimate(candidate) > self._sketch.estimate(victim)
+
+class CacheStats:
+    """Counters, load-time histogram and hottest keys for one cache
+    
+    The owning cache updates it under its own lock; nothing here prints.
+    A random 1 in `key_sample` lookups feeds the hottest-keys sketch, which
+    keeps its cost off most lookups; estimates are scaled back up. Sampling
+    at random rather than every N-th lookup keeps periodic traffic (keys
+    requested round-robin) from aliasing with the sample.
+    snapshot() gives a plain dict and to_prometheus() the text exposition
+    format.
+    """
+    
+    LOAD_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))  # seconds
+    
+    def __init__(self, top_k=10, key_sample=8):
+        self.hits = self.misses = self.rejections = 0
+        self.evictions = defaultdict(int)  # reason ("size", "bytes", "expired") -> count
+        self.load_failures = 0
+        self.load_buckets = [0] * len(self.LOAD_BUCKETS)
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self.top_k = top_k
+        self.key_sample = key_sample
+        self._sample_rate = 1 / key_sample
+        self._sketch = CountMinSketch(width=2048) if top_k else None
+        self._top = {}  # up to top_k candidate keys -> estimated requests
+        self._top_floor = 0  # never above the smallest estimate in _top
+        self._resets = 0  # sketch halvings already applied to _top
+    
+    def record(self, key):
+        """Count a lookup of key towards the hottest-keys estimate"""
+        if not self._sketch:
+            return
+        if random.random() >= self._sample_rate:
+            return
+        estimate = self._sketch.add(key)
+        if self._sketch.resets != self._resets:
+            # The sketch halved its counts; age the candidates and floor to match
+            shift = self._sketch.resets - self._resets
+            self._resets = self._sketch.resets
+            self._top = {top_key: count >> shift for top_key, count in self._top.items()}
+            self._top_floor >>= shift
+        if key in self._top or len(self._top) < self.top_k:
+            self._top[key] = estimate
+            return
+        if estimate <= self._top_floor:
+            return  # The common case: a cold key, decided without scanning _top
+        coldest = min(self._top, key=self._top.get)
+        if estimate > self._top[coldest]:
+            del self._top[coldest]
+            self._top[key] = estimate
+            coldest = min(self._top, key=self._top.get)
+        self._top_floor = self._top[coldest]
+    
+    def evict(self, reason):
+        self.evictions[reason] += 1
+    
+    def observe_load(self, seconds, failed=False):
+        self.load_count += 1
+        self.load_seconds += seconds
+        self.load_failures += failed
+        self.load_buckets[bisect.bisect_left(self.LOAD_BUCKETS, seconds)] += 1
+    
+    def top_keys(self):
+        """(key, estimated lookups) pairs, hottest first"""
+        return sorted(((key, estimate * self.key_sample) for key, estimate in self._top.items()),
+                      key=lambda item: item[1], reverse=True)
+    
+    @classmethod
+    def combine(cls, parts):
+        """One CacheStats summing several (e.g. the shards of a ShardedCache)"""
+        parts = list(parts)
+        total = cls(top_k=max((part.top_k for part in parts), default=0),
+                    key_sample=parts[0].key_sample if parts else 1)
+        total._sketch = None  # Estimates come from the parts' candidates below
+        for part in parts:
+            total.hits += part.hits
+            total.misses += part.misses
+            total.rejections += part.rejections
+            total.load_failures += part.load_failures
+            total.load_count += part.load_count
+            total.load_seconds += part.load_seconds
+            for reason, count in part.evictions.items():
+                total.evictions[reason] += count
+            for index, count in enumerate(part.load_buckets):
+                total.load_buckets[index] += count
+            total._top.update(part._top)
+        total._top = dict(sorted(total._top.items(), key=lambda item: item[1],
+                                 reverse=True)[:total.top_k])
+        return total
+    
+    def snapshot(self, size=0, current_bytes=0):
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "bytes": current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": sum(count for reason, count in self.evictions.items() if reason != "expired"),
+            "expirations": self.evictions.get("expired", 0),
+            "evictions_by_reason": dict(self.evictions),
+            "rejections": self.rejections,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "loads": self.load_count,
+            "load_failures": self.load_failures,
+            "load_seconds": {
+                "sum": self.load_seconds,
+                "buckets": dict(zip(self.LOAD_BUCKETS, itertools.accumulate(self.load_buckets)))
+            },
+            "top_keys": self.top_keys()
+        }
+    
+    def to_prometheus(self, name="cache", size=0, current_bytes=0):
+        """Render in the Prometheus text exposition format"""
+        def label(value):
+            text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return f'"{text}"'
+        
+        lines = []
+        def metric(metric_name, kind, help_text, samples):
+            lines.append(f"# HELP {name}_{metric_name} {help_text}")
+            lines.append(f"# TYPE {name}_{metric_name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f"{k}={label(v)}" for k, v in labels.items())
+                lines.append(f"{name}_{metric_name}{suffix}{{{label_text}}} {value}"
+                             if label_text else f"{name}_{metric_name}{suffix} {value}")
+        
+        metric("hits_total", "counter", "Lookups that found a live entry", [("", {}, self.hits)])
+        metric("misses_total", "counter", "Lookups that found nothing", [("", {}, self.misses)])
+        metric("evictions_total", "counter", "Entries removed, by reason",
+               [("", {"reason": reason}, count) for reason, count in sorted(self.evictions.items())])
+        metric("rejections_total", "counter", "Values refused by size or admission",
+               [("", {}, self.rejections)])
+        metric("size", "gauge", "Entries currently held", [("", {}, size)])
+        metric("bytes", "gauge", "Weighed bytes currently held", [("", {}, current_bytes)])
+        buckets = [("_bucket", {"le": "+Inf" if bound == float("inf") else bound}, count)
+                   for bound, count in zip(self.LOAD_BUCKETS, itertools.accumulate(self.load_buckets))]
+        metric("load_seconds", "histogram", "Time spent in loaders",
+               buckets + [("_sum", {}, self.load_seconds), ("_count", {}, self.load_count)])
+        metric("key_requests", "gauge", "Estimated requests for the hottest keys",
+               [("", {"key": key}, estimate) for key, estimate in self.top_keys()])
+        return "\n".join(lines) + "\n"
+
+EVICTION_POLICIES = {
+    "fifo": lambda capacity: FIFOPolicy(),
+    "lru": lambda capacity: LRUPolicy(),
+    "lfu": lambda capacity: LFUPolicy(),
+    "tinylfu": TinyLFUPolicy
+}
+
+def deep_sizeof(obj):
+    """sys.getsizeof of obj plus everything reachable through its containers,
+    attributes and slots (shared objects are counted once)"""
+    seen = set()
+    stack = [obj]
+    size = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, int, float, complex, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        if hasattr(item, "__dict__") and not isinstance(item, type):
+            stack.append(vars(item))
+        for slot in getattr(type(item), "__slots__", ()):
+            if hasattr(item, slot):
+                stack.append(getattr(item, slot))
+    return size
+
+_MISSING = object()
+
+class _Flight:
+    """One in-progress load; callers for the same key wait on it"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
 class ThreadSafeCache:
-    """Simple thread-safe cache implementation"""
+    """Thread-safe cache with a selectable eviction policy and optional TTLs
     
-    def __init__(self, max_size=100):
+    policy: "lru" (default), "lfu", "tinylfu" or "fifo".
+    ttl: default lifetime in seconds for entries (None = no expiry).
+    max_bytes: optional bound on the total weight of values; weigher(value)
+    gives a value's weight in bytes and defaults to deep_sizeof.
+    on_evict: optional callback(key, value) for entries pushed out to make
+    room (entries with a TTL are not passed on, since they may be stale).
+    top_k: how many of the hottest keys `metrics` tracks (0 disables it).
+    """
+    
+    def __init__(self, max_size=100, policy="lru", ttl=None, max_bytes=None, weigher=None,
+                 on_evict=None, top_k=10):
         self._cache = {}
+        self._expires = {}  # key -> _clock() deadline, only for keys with a TTL
+        self._weights = {}  # key -> weight, only when values are weighed
+        self._loading = {}  # key -> _Flight for loads in progress
+        self._failures = {}  # key -> (exception, _clock() deadline) for negative caching
         self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._weigher = weigher or (deep_sizeof if max_bytes is not None else None)
+        self._ttl = ttl
+        self._on_evict = on_evict
+        self._policy = EVICTION_POLICIES[policy](max_size)
         self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.metrics = CacheStats(top_k)
+    
+    _clock = staticmethod(time.monotonic)  # Source of TTL deadlines
+    
+    def __len__(self):
+        return len(self._cache)
     
-    def get(self, key):
+    def _remove(self, key):
+        del self._cache[key]
+        self._expires.pop(key, None)
+        self.current_bytes -= self._weights.pop(key, 0)
+        self._policy.on_remove(key)
+    
+    def _needs_room(self, key, weight):
+        """True while storing `weight` bytes under `key` would break a limit"""
+        if key not in self._cache and len(self._cache) >= self._max_size:
+            return True
+        if self._max_bytes is None:
+            return False
+        return self.current_bytes - self._weights.get(key, 0) + weight > self._max_bytes
+    
+    def get(self, key, default=None):
         with self._lock:
-            return self._cache.get(key)
+            self._policy.record(key)
+            self.metrics.record(key)
+            if key not in self._cache:
+                self.metrics.misses += 1
+                return default
+            deadline = self._expires.get(key)
+            if deadline is not None and deadline <= self._clock():
+                self._remove(key)
+                self.metrics.evict("expired")
+                self.metrics.misses += 1
+                return default
+            self.metrics.hits += 1
+            self._policy.on_access(key)
+            return self._cache[key]
     
-    def set(self, key, value):
+    def set(self, key, value, ttl=None):
+        ttl = self._ttl if ttl is None else ttl
+        # Weigh outside the lock; deep_sizeof can be slow for big values
+        weight = self._weigher(value) if self._weigher else 0
         with self._lock:
-            if len(self._cache) >= self._max_size:
-                # Simple eviction: remove first item
-                first_key = next(iter(self._cache))
-                del self._cache[first_key]
-            self._cache[key] = value
+            evicted = self._store(key, value, ttl, weight)
+        # Hooks run outside the lock so a slow spill doesn't block other threads
+        for victim, victim_value in evicted:
+            self._on_evict(victim, victim_value)
+    
+    def _store(self, key, value, ttl, weight):
+        """Insert under the lock; returns evicted (key, value) pairs for on_evict"""
+        evicted = []
+        if self._max_bytes is not None and weight > self._max_bytes:
+            # Could never fit; drop any older value instead of keeping it stale
+            if key in self._cache:
+                self._remove(key)
+            self.metrics.rejections += 1
+            return evicted
+        while self._needs_room(key, weight):
+            victim = self._policy.victim()
+            if victim == key:
+                # The entry being replaced is itself the cheapest to lose
+                self._remove(key)
+                continue
+            if key not in self._cache and not self._policy.admit(key, victim):
+                self.metrics.rejections += 1
+                return evicted
+            if self._on_evict and victim not in self._expires:
+                evicted.append((victim, self._cache[victim]))
+            full = key not in self._cache and len(self._cache) >= self._max_size
+            self._remove(victim)
+            self.metrics.evict("size" if full else "bytes")
+        if key in self._cache:
+            self._policy.on_access(key)
+            self.current_bytes -= self._weights.get(key, 0)
+        else:
+            self._policy.on_insert(key)
+        self._cache[key] = value
+        if self._weigher:
+            self._weights[key] = weight
+            self.current_bytes += weight
+        if ttl is not None:
+            self._expires[key] = self._clock() + ttl
+        else:
+            self._expires.pop(key, None)
+        return evicted
+    
+    def get_or_compute(self, key, loader, ttl=None, refresh_ahead=0, negative_ttl=None):
+        """Return the value for key, calling loader(key) to fill a miss
+        
+        Only one caller runs the loader for a given key; concurrent callers
+        wait for its result instead of loading the same value again.
+        refresh_ahead: seconds before expiry at which a hit starts a background
+        reload while the current value keeps being served.
+        negative_ttl: seconds to remember a loader failure and re-raise it
+        instead of calling the loader again.
+        """
+        with self._lock:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                deadline = self._expires.get(key)
+                if (refresh_ahead and deadline is not None and key not in self._loading
+                        and deadline - self._clock() <= refresh_ahead):
+                    self._loading[key] = _Flight()
+                    threading.Thread(target=self._load, args=(key, loader, ttl, negative_ttl),
+                                     daemon=True).start()
+                return value
+            failure = self._failures.get(key)
+            if failure is not None:
+                error, until = failure
+                if until > self._clock():
+                    raise error
+                del self._failures[key]
+            flight = self._loading.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._loading[key] = _Flight()
+        
+        if leader:
+            self._load(key, loader, ttl, negative_ttl)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+    
+    def _load(self, key, loader, ttl, negative_ttl):
+        """Run the loader for a registered flight and publish the outcome"""
+        flight = self._loading[key]
+        start = time.perf_counter()
+        try:
+            flight.value = loader(key)
+        except Exception as error:
+            flight.error = error
+            with self._lock:
+                if negative_ttl:
+                    self._failures[key] = (error, self._clock() + negative_ttl)
+        else:
+            self.set(key, flight.value, ttl)
+        finally:
+            with self._lock:
+                self.metrics.observe_load(time.perf_counter() - start, flight.error is not None)
+                del self._loading[key]
+            flight.done.set()
     
     def clear(self):
         with self._lock:
-            self._cache.clear()
+            for key in list(self._cache):
+                self._remove(key)
+            self._failures.clear()
+    
+    def drain(self):
+        """Empty the cache, handing every entry without a TTL to on_evict"""
+        with self._lock:
+            items = [(key, value) for key, value in self._cache.items()
+                     if key not in self._expires]
+            self.clear()
+        if self._on_evict:
+            for key, value in items:
+                self._on_evict(key, value)
+    
+    def stats(self):
+        with self._lock:
+            return self.metrics.snapshot(len(self._cache), self.current_bytes)
+    
+    def prometheus(self, name="cache"):
+        with self._lock:
+            return self.metrics.to_prometheus(name, len(self._cache), self.current_bytes)
 
 # Testing thread-safe cache
 cache = ThreadSafeCache(max_size=3)
@@ -358,6 +843,793 @@ cache.set("key1", "value1")
 cache.set("key2", "value2")
 print(f"Cache get key1: {cache.get('key1')}")
 
+def zipf_trace(num_keys, num_requests, skew=1.0, seed=42):
+    """Keys drawn with Zipfian popularity: key k is requested ~ 1/k^skew"""
+    rng = random.Random(seed)
+    weights = [1 / (rank ** skew) for rank in range(1, num_keys + 1)]
+    return rng.choices(range(num_keys), weights=weights, k=num_requests)
+
+def compare_eviction_policies(capacity=100, num_keys=10_000, num_requests=100_000, skew=1.0):
+    """Replay a Zipfian trace through each policy and report hit rates"""
+    trace = zipf_trace(num_keys, num_requests, skew)
+    results = {}
+    for policy in EVICTION_POLICIES:
+        policy_cache = ThreadSafeCache(max_size=capacity, policy=policy)
+        for key in trace:
+            if policy_cache.get(key) is None:
+                policy_cache.set(key, key)
+        results[policy] = policy_cache.stats()["hit_rate"]
+        print(f"  {policy:>8}: {results[policy]:.1%} hit rate")
+    return results
+
+# Spawned worker processes re-import this module, so the slower demos and
+# benchmarks from here on only run when the file is executed directly
+if __name__ == "__main__":
+    print("Eviction policies on a Zipfian trace (capacity 100, 10,000 keys):")
+    compare_eviction_policies(num_requests=20_000)
+
+import math
+
+class ShardedCache:
+    """ThreadSafeCache split into independently locked shards
+    
+    Keys are hashed to one of `shards` segments so threads touching
+    different keys rarely contend. Each shard holds
+    ceil(max_size * (1 + tolerance) / shards) entries, so the total never
+    exceeds max_size by more than the tolerance (plus rounding). max_bytes
+    is split across the shards the same way.
+    """
+    
+    def __init__(self, max_size=100, shards=16, tolerance=0.1, policy="lru", ttl=None,
+                 max_bytes=None, weigher=None):
+        shard_size = max(1, math.ceil(max_size * (1 + tolerance) / shards))
+        shard_bytes = None
+        if max_bytes is not None:
+            shard_bytes = math.ceil(max_bytes * (1 + tolerance) / shards)
+        self._shards = [ThreadSafeCache(shard_size, policy, ttl, shard_bytes, weigher)
+                        for _ in range(shards)]
+        self.max_size = max_size
+        self.capacity = shard_size * shards
+    
+    @property
+    def current_bytes(self):
+        return sum(shard.current_bytes for shard in self._shards)
+    
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+    
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+    
+    def get(self, key, default=None):
+        return self._shard(key).get(key, default)
+    
+    def set(self, key, value, ttl=None):
+        self._shard(key).set(key, value, ttl)
+    
+    def get_or_compute(self, key, loader, ttl=None, refresh_ahead=0, negative_ttl=None):
+        return self._shard(key).get_or_compute(key, loader, ttl, refresh_ahead, negative_ttl)
+    
+    def clear(self):
+        for shard in self._shards:
+            shard.clear()
+    
+    @property
+    def metrics(self):
+        return CacheStats.combine(shard.metrics for shard in self._shards)
+    
+    def stats(self):
+        return self.metrics.snapshot(len(self), self.current_bytes)
+    
+    def prometheus(self, name="cache"):
+        return self.metrics.to_prometheus(name, len(self), self.current_bytes)
+
+def benchmark_cache_threads(thread_counts=(1, 2, 4, 8), ops_per_thread=20_000, num_keys=1_000):
+    """Compare get/set throughput of the single-lock and sharded caches
+    
+    On a regular (GIL) build the sharded cache mostly saves lock hand-offs;
+    on a free-threaded build (python3.13t) it lets threads run in parallel.
+    """
+    gil_check = getattr(sys, "_is_gil_enabled", None)
+    gil = "enabled" if gil_check is None or gil_check() else "disabled (free-threaded)"
+    print(f"Python {sys.version.split()[0]}, GIL {gil}")
+    
+    def worker(target, keys):
+        for key in keys:
+            if target.get(key) is None:
+                target.set(key, key)
+    
+    results = {}
+    for name, factory in (("single lock", lambda: ThreadSafeCache(max_size=num_keys)),
+                          ("sharded", lambda: ShardedCache(max_size=num_keys))):
+        for count in thread_counts:
+            target = factory()
+            traces = [zipf_trace(num_keys, ops_per_thread, seed=n) for n in range(count)]
+            workers = [threading.Thread(target=worker, args=(target, trace)) for trace in traces]
+            start = time.perf_counter()
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+            elapsed = time.perf_counter() - start
+            results[(name, count)] = count * ops_per_thread / elapsed
+            print(f"  {name:>11}, {count} threads: {results[(name, count)]:,.0f} ops/s")
+    return results
+
+if __name__ == "__main__":
+    print("\nSingle-lock vs sharded cache throughput:")
+    benchmark_cache_threads(thread_counts=(1, 4), ops_per_thread=5_000)
+    
+    # Bounding by bytes: a few large blobs push out many small values
+    print("\nByte-bounded cache (max_bytes=1 MB):")
+    sized_cache = ThreadSafeCache(max_size=10_000, max_bytes=1_000_000)
+    for i in range(1_000):
+        sized_cache.set(f"small-{i}", i)
+    for i in range(4):
+        sized_cache.set(f"blob-{i}", bytes(300_000))
+    sized_cache.set("huge", bytes(5_000_000))  # larger than the whole cache: rejected
+    print(f"  Entries: {len(sized_cache)}, bytes held: {sized_cache.current_bytes:,}")
+    sized_stats = sized_cache.stats()
+    print(f"  Evictions: {sized_stats['evictions_by_reason']}, rejections: {sized_stats['rejections']}")
+    
+    # Single-flight loading: many threads miss the same key, one loader runs
+    print("\nSingle-flight get_or_compute:")
+    load_calls = []
+    
+    def slow_loader(key):
+        load_calls.append(key)
+        time.sleep(0.05)  # Simulate an expensive query
+        return f"report for {key}"
+    
+    loading_cache = ThreadSafeCache(max_size=10)
+    herd = [threading.Thread(target=loading_cache.get_or_compute, args=("daily", slow_loader))
+            for _ in range(8)]
+    for t in herd:
+        t.start()
+    for t in herd:
+        t.join()
+    print(f"  8 concurrent misses -> loader ran {len(load_calls)} time(s)")
+    
+    # Refresh-ahead: near expiry the stale value is served while a reload runs
+    loading_cache.set("daily", "old report", ttl=0.1)
+    time.sleep(0.06)
+    print(f"  Near expiry: {loading_cache.get_or_compute('daily', slow_loader, ttl=0.1, refresh_ahead=0.05)}")
+    time.sleep(0.08)
+    print(f"  After background refresh: {loading_cache.get('daily')}")
+    
+    # Negative caching: a failing loader is not retried until negative_ttl passes
+    def failing_loader(key):
+        load_calls.append(key)
+        raise ConnectionError(f"backend unavailable for {key}")
+    
+    load_calls.clear()
+    for _ in range(3):
+        try:
+            loading_cache.get_or_compute("weekly", failing_loader, negative_ttl=1.0)
+        except ConnectionError as e:
+            print(f"  Failed: {e}")
+    print(f"  Loader calls for 3 failing lookups: {len(load_calls)}")
+
+# Sharing one warm cache between processes
+import hashlib
+import multiprocessing
+import os
+import pickle
+import struct
+from multiprocessing import shared_memory
+
+class SharedMemoryCache:
+    """Cache with the ThreadSafeCache get/set/clear API whose data lives in
+    a multiprocessing.shared_memory block, so worker processes share it
+    
+    Layout: a header, a fixed-size open-addressing hash table of slots, and
+    an arena of pickled key/value records the slots point into. Writers
+    take a cross-process lock and bump a sequence counter (a seqlock), so
+    readers copy records without locking and retry if a write overlapped.
+    When the arena or table fills up, dead records are compacted away; if
+    that is not enough the oldest records are evicted (FIFO). Keys must pickle the same way
+    in every process (str, int, tuples of those).
+    """
+    
+    HEADER = struct.Struct("QQQQ")  # sequence, arena bytes used, live entries, used slots
+    SLOT = struct.Struct("QQII")  # key hash (0 empty, 1 deleted), record offset, key length, value length
+    EMPTY, DELETED = 0, 1
+    MAX_LOAD = 0.75
+    
+    def __init__(self, slots=1024, arena_bytes=1 << 20, name=None, lock=None, create=True):
+        self._slots = slots
+        self._arena_bytes = arena_bytes
+        self._table_start = self.HEADER.size
+        self._arena_start = self._table_start + slots * self.SLOT.size
+        self._lock = lock or multiprocessing.Lock()
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=self._arena_start + arena_bytes)
+            self._buf = self._shm.buf
+            self._buf[:self._arena_start] = bytes(self._arena_start)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._buf = self._shm.buf
+        self.name = self._shm.name
+        self._owner_pid = os.getpid() if create else None  # forked children inherit the object
+        self.hits = self.misses = 0  # per process
+    
+    # Pickling hands other processes a handle that attaches to the same block
+    def __getstate__(self):
+        return (self._slots, self._arena_bytes, self.name, self._lock)
+    
+    def __setstate__(self, state):
+        slots, arena_bytes, name, lock = state
+        self.__init__(slots, arena_bytes, name, lock, create=False)
+    
+    def __len__(self):
+        return self.HEADER.unpack_from(self._buf, 0)[2]
+    
+    @staticmethod
+    def _key_hash(key_bytes):
+        # hash() is salted per process, so use a stable digest instead
+        digest = hashlib.blake2b(key_bytes, digest_size=8).digest()
+        return max(int.from_bytes(digest, "little"), 2)
+    
+    def _slot(self, index):
+        return self.SLOT.unpack_from(self._buf, self._table_start + index * self.SLOT.size)
+    
+    def _write_slot(self, index, key_hash, offset, key_len, value_len):
+        self.SLOT.pack_into(self._buf, self._table_start + index * self.SLOT.size,
+                            key_hash, offset, key_len, value_len)
+    
+    def _locate(self, key_bytes, key_hash):
+        """Slot index holding key_bytes, or -1"""
+        index = key_hash % self._slots
+        for _ in range(self._slots):
+            slot_hash, offset, key_len, value_len = self._slot(index)
+            if slot_hash == self.EMPTY:
+                return -1
+            if slot_hash == key_hash and key_len == len(key_bytes):
+                start = self._arena_start + offset
+                if self._buf[start:start + key_len] == key_bytes:
+                    return index
+            index = (index + 1) % self._slots
+        return -1
+    
+    def _read_value(self, key_bytes, key_hash):
+        index = self._locate(key_bytes, key_hash)
+        if index < 0:
+            return None
+        _, offset, key_len, value_len = self._slot(index)
+        start = self._arena_start + offset + key_len
+        return bytes(self._buf[start:start + value_len])
+    
+    def get(self, key, default=None):
+        key_bytes = pickle.dumps(key)
+        key_hash = self._key_hash(key_bytes)
+        value_bytes = None
+        for _ in range(3):
+            before = self.HEADER.unpack_from(self._buf, 0)[0]
+            if before % 2:
+                continue  # A write is in progress
+            try:
+                value_bytes = self._read_value(key_bytes, key_hash)
+            except (struct.error, ValueError):
+                continue  # Read a half-written slot; try again
+            if self.HEADER.unpack_from(self._buf, 0)[0] == before:
+                break
+        else:
+            with self._lock:
+                value_bytes = self._read_value(key_bytes, key_hash)
+        if value_bytes is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(value_bytes)
+    
+    def _begin_write(self):
+        sequence, *rest = self.HEADER.unpack_from(self._buf, 0)
+        self.HEADER.pack_into(self._buf, 0, sequence + 1, *rest)
+    
+    _end_write = _begin_write
+    
+    def _set_header(self, arena_used, live, used_slots):
+        sequence = self.HEADER.unpack_from(self._buf, 0)[0]
+        self.HEADER.pack_into(self._buf, 0, sequence, arena_used, live, used_slots)
+    
+    def _reset(self):
+        self._buf[self._table_start:self._arena_start] = bytes(self._arena_start - self._table_start)
+        self._set_header(0, 0, 0)
+    
+    def _insert(self, key_bytes, value_bytes, key_hash):
+        """Append a record and point a free slot at it; False if out of room"""
+        _, arena_used, live, used_slots = self.HEADER.unpack_from(self._buf, 0)
+        size = len(key_bytes) + len(value_bytes)
+        if arena_used + size > self._arena_bytes or used_slots + 1 > self._slots * self.MAX_LOAD:
+            return False
+        index = key_hash % self._slots
+        while self._slot(index)[0] not in (self.EMPTY, self.DELETED):
+            index = (index + 1) % self._slots
+        if self._slot(index)[0] == self.EMPTY:
+            used_slots += 1
+        start = self._arena_start + arena_used
+        self._buf[start:start + size] = key_bytes + value_bytes
+        self._write_slot(index, key_hash, arena_used, len(key_bytes), len(value_bytes))
+        self._set_header(arena_used + size, live + 1, used_slots)
+        return True
+    
+    def _compact(self):
+        """Rewrite live records to the front of the arena and drop deleted slots"""
+        records = []
+        for index in range(self._slots):
+            slot_hash, offset, key_len, value_len = self._slot(index)
+            if slot_hash > self.DELETED:
+                start = self._arena_start + offset
+                records.append((offset, slot_hash, bytes(self._buf[start:start + key_len]),
+                                bytes(self._buf[start + key_len:start + key_len + value_len])))
+        records.sort()  # Keep arena order, which is insertion order
+        self._reset()
+        for _, slot_hash, key_bytes, value_bytes in records:
+            self._insert(key_bytes, value_bytes, slot_hash)
+    
+    def _evict_for(self, size):
+        """Delete the oldest records until one of `size` bytes fits, then compact"""
+        _, arena_used, live, used_slots = self.HEADER.unpack_from(self._buf, 0)
+        records = sorted((offset, index, key_len + value_len)
+                         for index, (slot_hash, offset, key_len, value_len)
+                         in ((index, self._slot(index)) for index in range(self._slots))
+                         if slot_hash > self.DELETED)
+        for offset, index, length in records:
+            if arena_used + size <= self._arena_bytes and live + 1 <= self._slots * self.MAX_LOAD:
+                break
+            self._write_slot(index, self.DELETED, 0, 0, 0)
+            arena_used -= length
+            live -= 1
+        self._set_header(arena_used, live, used_slots)
+        self._compact()
+    
+    def set(self, key, value):
+        key_bytes = pickle.dumps(key)
+        value_bytes = pickle.dumps(value)
+        key_hash = self._key_hash(key_bytes)
+        with self._lock:
+            self._begin_write()
+            try:
+                index = self._locate(key_bytes, key_hash)
+                if index >= 0:
+                    self._write_slot(index, self.DELETED, 0, 0, 0)
+                    _, arena_used, live, used_slots = self.HEADER.unpack_from(self._buf, 0)
+                    self._set_header(arena_used, live - 1, used_slots)
+                if len(key_bytes) + len(value_bytes) > self._arena_bytes:
+                    return  # Too big to store; the old value is gone, as in ThreadSafeCache
+                if not self._insert(key_bytes, value_bytes, key_hash):
+                    self._compact()
+                    if not self._insert(key_bytes, value_bytes, key_hash):
+                        self._evict_for(len(key_bytes) + len(value_bytes))
+                        self._insert(key_bytes, value_bytes, key_hash)
+            finally:
+                self._end_write()
+    
+    def clear(self):
+        with self._lock:
+            self._begin_write()
+            try:
+                self._reset()
+            finally:
+                self._end_write()
+    
+    def close(self):
+        """Detach this process; the creator also frees the block"""
+        self._buf.release()
+        self._shm.close()
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
+
+def _shared_cache_worker(name, cache, keys, computed):
+    """Fill the shared cache with squares, counting values computed locally"""
+    count = 0
+    for key in keys:
+        if cache.get(key) is None:
+            time.sleep(0.001)  # Simulate an expensive computation
+            cache.set(key, key * key)
+            count += 1
+    computed.put((name, count))
+    cache.close()
+
+def demonstrate_shared_cache(workers=3, num_keys=200):
+    """Workers sharing one cache compute each value once between them"""
+    cache = SharedMemoryCache(slots=1024, arena_bytes=256 * 1024)
+    computed = multiprocessing.Queue()
+    for key in range(0, num_keys, 2):
+        cache.set(key, key * key)  # Parent warms half the keys
+    processes = []
+    for i in range(workers):
+        # Each worker starts at a different point so they benefit from each other
+        start = i * num_keys // workers
+        keys = list(range(start, num_keys)) + list(range(start))
+        processes.append(multiprocessing.Process(target=_shared_cache_worker,
+                                                 args=(f"Worker-{i + 1}", cache, keys, computed)))
+    for p in processes:
+        p.start()
+    results = [computed.get() for _ in processes]
+    for p in processes:
+        p.join()
+    for name, count in sorted(results):
+        print(f"  {name} computed {count} of {num_keys} values")
+    print(f"  Shared entries: {len(cache)}, cache[42] = {cache.get(42)}")
+    cache.close()
+
+if __name__ == "__main__":
+    print("\nShared-memory cache across processes:")
+    demonstrate_shared_cache()
+
+# Two-tier cache: memory in front of a persistent disk log
+import mmap
+import tempfile
+import zlib
+
+class DiskStore:
+    """Log-structured key/value file with an in-memory index
+    
+    Each record is a header (crc32, key length, value length) followed by
+    the pickled key and value; deletes append a tombstone. Reads go through
+    an mmap of the file. Opening the file scans it to rebuild the index,
+    skips damaged records (resuming at the next record whose checksum
+    holds) and truncates only damage that runs to the end of the file, such
+    as a torn record left by a crash. When the file outgrows
+    max_bytes it is compacted, dropping the oldest entries if live data
+    alone is too big (the newest entry always survives).
+    """
+    
+    RECORD = struct.Struct("<III")
+    TOMBSTONE = 0xFFFFFFFF
+    
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._index = {}  # key bytes -> (value offset, value length, crc), oldest first
+        self._lock = threading.Lock()
+        self._map = None
+        self.corrupt_reads = 0
+        self._file = open(path, "a+b")
+        self._scan()
+    
+    def __len__(self):
+        return len(self._index)
+    
+    def __contains__(self, key):
+        return pickle.dumps(key) in self._index
+    
+    @staticmethod
+    def _checksum(key_bytes, value_bytes, value_len):
+        return zlib.crc32(value_bytes, zlib.crc32(key_bytes, value_len))
+    
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.flush()
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) if size else None
+    
+    def _record_at(self, data, offset):
+        """(key bytes, value length, crc, end) of an intact record at offset, else None"""
+        if offset + self.RECORD.size > len(data):
+            return None
+        crc, key_len, value_len = self.RECORD.unpack_from(data, offset)
+        key_start = offset + self.RECORD.size
+        end = key_start + key_len + (0 if value_len == self.TOMBSTONE else value_len)
+        # A damaged length field must not send the scan past the end of the file
+        if key_len < 2 or end > len(data):
+            return None
+        key_bytes = bytes(data[key_start:key_start + key_len])
+        if self._checksum(key_bytes, data[key_start + key_len:end], value_len) != crc:
+            return None
+        return key_bytes, value_len, crc, end
+    
+    def _resync(self, data, offset):
+        """Offset of the first intact record after damage at offset, or None"""
+        position = offset + 1
+        while True:
+            # Keys are pickles, which start with the PROTO opcode 0x80
+            marker = data.find(b"\x80", position + self.RECORD.size)
+            if marker < 0:
+                return None
+            if self._record_at(data, marker - self.RECORD.size) is not None:
+                return marker - self.RECORD.size
+            position = marker - self.RECORD.size + 1
+    
+    def _scan(self):
+        """Rebuild the index from the log, cutting off a torn tail"""
+        self._remap()
+        data = self._map or b""
+        offset = 0
+        while offset + self.RECORD.size <= len(data):
+            record = self._record_at(data, offset)
+            if record is None:
+                self.corrupt_reads += 1  # Skip the damaged stretch, keep the rest
+                next_offset = self._resync(data, offset)
+                if next_offset is None:
+                    break  # Nothing intact follows: a torn tail, cut off below
+                offset = next_offset
+                continue
+            key_bytes, value_len, crc, end = record
+            self._index.pop(key_bytes, None)  # re-insert so the index stays oldest first
+            if value_len != self.TOMBSTONE:
+                self._index[key_bytes] = (offset + self.RECORD.size + len(key_bytes), value_len, crc)
+            offset = end
+        if offset < len(data):
+            self._map.close()
+            self._map = None
+            self._file.truncate(offset)
+            self._remap()
+    
+    def _append(self, key_bytes, value_bytes, value_len):
+        crc = self._checksum(key_bytes, value_bytes, value_len)
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(self.RECORD.pack(crc, len(key_bytes), value_len) + key_bytes + value_bytes)
+        return offset + self.RECORD.size + len(key_bytes), crc
+    
+    def get(self, key, default=None):
+        key_bytes = pickle.dumps(key)
+        with self._lock:
+            entry = self._index.get(key_bytes)
+            if entry is None:
+                return default
+            offset, value_len, crc = entry
+            if self._map is None or offset + value_len > len(self._map):
+                self._remap()  # The file grew since the last mapping
+            value_bytes = self._map[offset:offset + value_len]
+            if self._checksum(key_bytes, value_bytes, value_len) != crc:
+                # Bit rot or a partial overwrite: never hand back bad data
+                del self._index[key_bytes]
+                self.corrupt_reads += 1
+                return default
+        return pickle.loads(value_bytes)
+    
+    def put(self, key, value):
+        key_bytes = pickle.dumps(key)
+        value_bytes = pickle.dumps(value)
+        with self._lock:
+            self._index.pop(key_bytes, None)
+            offset, crc = self._append(key_bytes, value_bytes, len(value_bytes))
+            self._index[key_bytes] = (offset, len(value_bytes), crc)
+            if self._file.tell() > self.max_bytes:
+                self._compact()
+    
+    def delete(self, key):
+        key_bytes = pickle.dumps(key)
+        with self._lock:
+            if self._index.pop(key_bytes, None) is not None:
+                self._append(key_bytes, b"", self.TOMBSTONE)
+    
+    def _compact(self):
+        """Rewrite live records into a fresh file, keeping the newest half of max_bytes"""
+        self._remap()
+        records = []
+        budget = self.max_bytes // 2
+        for key_bytes, (offset, value_len, crc) in reversed(list(self._index.items())):
+            size = self.RECORD.size + len(key_bytes) + value_len
+            if size > budget and records:
+                continue  # Too big for what is left; smaller, older records may fit
+            budget -= size
+            records.append((key_bytes, bytes(self._map[offset:offset + value_len])))
+        self._map.close()
+        self._map = None
+        temp_path = self.path + ".compact"
+        with open(temp_path, "wb") as temp:
+            index = {}
+            position = 0
+            for key_bytes, value_bytes in reversed(records):
+                crc = self._checksum(key_bytes, value_bytes, len(value_bytes))
+                temp.write(self.RECORD.pack(crc, len(key_bytes), len(value_bytes)) + key_bytes + value_bytes)
+                index[key_bytes] = (position + self.RECORD.size + len(key_bytes), len(value_bytes), crc)
+                position += self.RECORD.size + len(key_bytes) + len(value_bytes)
+            temp.flush()
+            os.fsync(temp.fileno())
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a+b")
+        self._index = index
+        self._remap()
+    
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+    
+    def close(self):
+        self.flush()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+class TieredCache:
+    """ThreadSafeCache backed by a DiskStore
+    
+    Entries evicted from memory are spilled to disk; a memory miss falls
+    back to the disk tier and promotes what it finds. close() spills the
+    whole memory tier, so reopening the same path starts warm.
+    """
+    
+    def __init__(self, path, max_size=100, disk_bytes=64 * 1024 * 1024, **cache_options):
+        self.disk = DiskStore(path, disk_bytes)
+        self.memory = ThreadSafeCache(max_size, on_evict=self.disk.put, **cache_options)
+        self.memory_hits = self.disk_hits = self.misses = 0
+    
+    def get(self, key, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self.memory_hits += 1
+            return value
+        value = self.disk.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.disk_hits += 1
+        self.memory.set(key, value)
+        return value
+    
+    def set(self, key, value, ttl=None):
+        if key in self.disk:
+            self.disk.delete(key)  # The disk copy would be stale after a restart
+        self.memory.set(key, value, ttl)
+    
+    def clear(self):
+        self.memory.clear()
+        for key_bytes in list(self.disk._index):
+            self.disk.delete(pickle.loads(key_bytes))
+    
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_entries": len(self.disk),
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+        }
+    
+    def close(self):
+        self.memory.drain()
+        self.disk.close()
+
+def measure_warm_restart(path, num_keys=5_000, num_requests=20_000, max_size=500):
+    """Hit rate of a fresh process's first requests, cold vs restarted from disk"""
+    trace = zipf_trace(num_keys, num_requests)
+    results = {}
+    for label in ("cold start", "warm restart"):
+        tiered = TieredCache(path, max_size=max_size)
+        for key in trace[:num_requests // 2]:
+            if tiered.get(key) is None:
+                tiered.set(key, f"value-{key}")
+        results[label] = tiered.stats()
+        tiered.close()  # Simulates a deploy: the next iteration reopens the same file
+        print(f"  {label:>12}: {results[label]['hit_rate']:.1%} hit rate "
+              f"({results[label]['disk_hits']} from disk)")
+    return results
+
+def check_disk_compaction(path):
+    """An entry bigger than the compaction budget must not empty the store"""
+    store = DiskStore(path, max_bytes=10_000)
+    for i in range(40):
+        store.put(i, b"x" * 100)
+    store.put("big", b"y" * 6_000)
+    assert store.get("big") == b"y" * 6_000, "newest entry lost"
+    for i in range(40, 100):
+        store.put(i, b"x" * 100)
+    kept = len(store)
+    assert store.get(99) == b"x" * 100 and kept > 20, "compaction dropped the store"
+    store.close()
+    print(f"  Compaction kept {kept} entries after an oversized put")
+
+if __name__ == "__main__":
+    print("\nTiered cache, cold start vs warm restart:")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        measure_warm_restart(os.path.join(cache_dir, "cache.log"))
+        check_disk_compaction(os.path.join(cache_dir, "compact.log"))
+
+# Async-native cache for asyncio services
+import contextlib
+import inspect
+
+class AsyncCache(ThreadSafeCache):
+    """ThreadSafeCache for code running on one event loop
+    
+    Everything happens on the loop thread, so the lock is a no-op and TTLs
+    follow the loop's clock. get/set never block; get_or_compute is
+    awaitable and coalesces concurrent loads of a key into one task.
+    """
+    
+    def __init__(self, max_size=100, policy="lru", ttl=None, **options):
+        super().__init__(max_size, policy, ttl, **options)
+        self._lock = contextlib.nullcontext()
+    
+    def _clock(self):
+        return asyncio.get_running_loop().time()
+    
+    async def get_or_compute(self, key, loader, ttl=None):
+        """Return the value for key, awaiting loader(key) to fill a miss
+        
+        The load runs as its own task and every waiter shields it, so one
+        caller being cancelled doesn't cancel the load for the others.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.ensure_future(self._load_async(key, loader, ttl))
+        return await asyncio.shield(task)
+    
+    async def _load_async(self, key, loader, ttl):
+        start = time.perf_counter()
+        failed = True
+        try:
+            value = loader(key)
+            if inspect.isawaitable(value):
+                value = await value
+            self.set(key, value, ttl)
+            failed = False
+            return value
+        finally:
+            self.metrics.observe_load(time.perf_counter() - start, failed)
+            del self._loading[key]
+
+def benchmark_async_cache(num_requests=20_000, concurrency=100, num_keys=1_000):
+    """AsyncCache on the loop vs ThreadSafeCache through run_in_executor"""
+    trace = zipf_trace(num_keys, num_requests)
+    
+    async def load_async(key):
+        await asyncio.sleep(0.001)  # Simulate an async backend call
+        return key * 2
+    
+    def load_blocking(key):
+        time.sleep(0.001)
+        return key * 2
+    
+    async def run(lookup):
+        position = 0
+        
+        async def client():
+            nonlocal position
+            while position < len(trace):
+                key = trace[position]
+                position += 1
+                await lookup(key)
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return num_requests / (time.perf_counter() - start)
+    
+    async def main():
+        async_cache = AsyncCache(max_size=num_keys // 2)
+        async_rate = await run(lambda key: async_cache.get_or_compute(key, load_async))
+        
+        thread_cache = ThreadSafeCache(max_size=num_keys // 2)
+        loop = asyncio.get_running_loop()
+        executor_rate = await run(lambda key: loop.run_in_executor(
+            None, thread_cache.get_or_compute, key, load_blocking))
+        return async_rate, executor_rate
+    
+    async_rate, executor_rate = asyncio.run(main())
+    print(f"  AsyncCache:                        {async_rate:,.0f} lookups/s")
+    print(f"  ThreadSafeCache + run_in_executor: {executor_rate:,.0f} lookups/s")
+    return async_rate, executor_rate
+
+if __name__ == "__main__":
+    print("\nAsync cache vs thread cache in an executor:")
+    benchmark_async_cache()
+
+# Observability: structured stats instead of prints on the hot path
+if __name__ == "__main__":
+    print("\nCache metrics:")
+    observed_cache = ThreadSafeCache(max_size=200, top_k=5)
+    for key in zipf_trace(2_000, 10_000):
+        observed_cache.get_or_compute(key, lambda k: k * k)
+    snapshot = observed_cache.stats()
+    print(f"  Hit rate {snapshot['hit_rate']:.1%}, evictions by reason {snapshot['evictions_by_reason']}")
+    print(f"  Loads: {snapshot['loads']}, hottest keys: {snapshot['top_keys']}")
+    print("  Prometheus export (first lines):")
+    for line in observed_cache.prometheus("demo_cache").splitlines()[:6]:
+        print(f"    {line}")
+
 print("\n" + "="*50)
 print("Advanced Python Topics completed!")
 print("You now have comprehensive coverage of:")